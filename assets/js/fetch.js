@@ -24,18 +24,66 @@ async function request (url, params, method = 'GET') {
   if (response.status !== 200) {
     return generateErrorResponse('The server responded with an unexpected status.')
   }
+  if (response.headers.get('Content-Type') === 'application/octet-stream') {
+    return decodeBinary(await response.arrayBuffer())
+  }
   const result = await response.json()
 
   // returns a single Promise object
   return result
 }
 
+// read a newline delimited json response and call onRecord for each record
+// as soon as it has been received
+async function requestStream (url, params, onRecord, method = 'POST') {
+  const response = await fetch(`${_apiHost}${url}?format=ndjson`, {
+    method,
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'application/x-ndjson'
+    },
+    body: JSON.stringify(params)
+  })
+  if (response.status !== 200) {
+    throw generateErrorResponse('The server responded with an unexpected status.')
+  }
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+    const lines = buffered.split('\n')
+    buffered = lines.pop() // keep incomplete line
+    lines.filter(line => line.length > 0).forEach(line => onRecord(JSON.parse(line)))
+  }
+  if (buffered.length > 0) {
+    onRecord(JSON.parse(buffered))
+  }
+}
+
 // converts an object into a query string
 // ex {region: 8:12-55} --> &region=8:12-55
 export function objectToQueryString (obj) {
   return Object.keys(obj).map(key => key + '=' + obj[key]).join('&')
 }
 
+// decode binary response into an object where arrays are read as Int32Array
+// format: <uint32 header length><json header><int32 arrays>
+export function decodeBinary (buffer) {
+  const headerLength = new DataView(buffer).getUint32(0, true)
+  const header = new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength))
+  const dataStart = 4 + headerLength
+  return JSON.parse(header, (key, value) => {
+    if (value !== null && typeof value === 'object' && '$int32' in value) {
+      const [offset, length] = value.$int32
+      return new Int32Array(buffer, dataStart + offset * 4, length)
+    }
+    return value
+  })
+}
+
 //  A generic error handler that just returns an object with status=error and message
 function generateErrorResponse (message) {
   return new Error({
@@ -52,6 +100,10 @@ export function create (url, params) {
   return request(url, params, 'POST')
 }
 
+export function stream (url, params, onRecord) {
+  return requestStream(url, params, onRecord)
+}
+
 export function update (url, params) {
   return request(url, params, 'PUT')
 }
@@ -1,4 +1,4 @@
-import { objectToQueryString } from './fetch.js'
+import { decodeBinary, objectToQueryString } from './fetch.js'
 
 describe('Test objectToQueryString', () => {
   test('test objectToQueryString single args', () => {
@@ -18,3 +18,21 @@ describe('Test objectToQueryString', () => {
     expect(paramString).toBe('region=1:1-10&page=1&print=true')
   })
 })
+
+describe('Test decodeBinary', () => {
+  test('test decodeBinary reads arrays as Int32Array', () => {
+    // header is padded to align arrays to four bytes
+    const header = '{"chrom": "1", "data": {"$int32": [0, 2]}, "baf": {"$int32": [2, 1]}}   '
+    const buffer = new ArrayBuffer(4 + header.length + 3 * 4)
+    const view = new DataView(buffer)
+    view.setUint32(0, header.length, true)
+    new Uint8Array(buffer, 4).set(new TextEncoder().encode(header))
+    const values = [10, -20, 30]
+    values.forEach((value, i) => view.setInt32(4 + header.length + i * 4, value, true))
+
+    const result = decodeBinary(buffer)
+    expect(result.chrom).toBe('1')
+    expect(Array.from(result.data)).toEqual([10, -20])
+    expect(Array.from(result.baf)).toEqual([30])
+  })
+})
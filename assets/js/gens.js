@@ -3,6 +3,7 @@
 import { InteractiveCanvas } from './interactive.js'
 import { OverviewCanvas } from './overview.js'
 import { VariantTrack, AnnotationTrack, TranscriptTrack, CytogeneticIdeogram } from './track.js'
+import { setupGeneAutocomplete } from './navigation.js'
 export {
   setupDrawEventManager, drawTrack, previousChromosome, nextChromosome,
   panTracks, zoomIn, zoomOut, parseRegionDesignation, queryRegionOrGene
@@ -16,6 +17,7 @@ export function initCanvases({ sampleName, genomeBuild, hgFileDir, uiColors, sel
   const lineMargin = 2 // Margin for line thickness
   // Listener values
   const inputField = document.getElementById('region-field')
+  setupGeneAutocomplete({ inputField, genomeBuild })
   // Initiate interactive canvas
   const ic = new InteractiveCanvas(inputField, lineMargin, near, far, sampleName, genomeBuild, hgFileDir)
   // Initiate variant, annotation and transcript canvases
@@ -243,7 +243,8 @@ export class InteractiveCanvas extends BaseScatterTrack {
       baf_y_end: this.baf.yEnd,
       log2_y_start: this.log2.yStart,
       log2_y_end: this.log2.yEnd,
-      reduce_data: 1
+      reduce_data: 1,
+      format: 'binary'
     }).then(result => {
       console.timeEnd('getcoverage')
       if (result.status === 'error') {
@@ -132,6 +132,29 @@ export function queryRegionOrGene(query, genomeBuild = 38) {
   }
 }
 
+// Suggest gene names in the datalist of the region input field
+export function setupGeneAutocomplete({ inputField, genomeBuild = 38, delay = 200 }) {
+  const datalist = document.getElementById(inputField.getAttribute('list'))
+  let timeout = null
+  inputField.addEventListener('input', () => {
+    clearTimeout(timeout)
+    const prefix = inputField.value.trim()
+    if (prefix.length < 2 || prefix.includes(':') || CHROMOSOMES.includes(prefix)) {
+      return
+    }
+    timeout = setTimeout(() => {
+      get('autocomplete-gene-name', { prefix: prefix, genome_build: genomeBuild })
+        .then(result => {
+          datalist.replaceChildren(...result.gene_names.map(name => {
+            const option = document.createElement('option')
+            option.value = name
+            return option
+          }))
+        })
+    }, delay)
+  })
+}
+
 // goto the next chromosome
 export function nextChromosome() {
   const position = readInputField()
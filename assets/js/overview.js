@@ -1,7 +1,7 @@
 // Overview canvas definition
 
 import { BaseScatterTrack, CHROMOSOMES } from './track.js'
-import { create, get } from './fetch.js'
+import { get, stream } from './fetch.js'
 import { createGraph, drawPoints, drawGraphLines, drawText, drawRotatedText } from './draw.js'
 
 import { drawTrack } from './navigation.js'
@@ -223,27 +223,48 @@ export class OverviewCanvas extends BaseScatterTrack {
 
   async drawOverviewContent (printing) {
     await this.getOverviewChromDim()
-    // query gens for coverage values
-    const covData = await create('get-multiple-coverages', {
-      sample_id: this.sampleName,
-      genome_build: this.genomeBuild,
-      plot_height: this.plotHeight,
-      chromosome_pos: this.chromPos,
-      top_bottom_padding: this.topBottomPadding,
-      baf_y_start: this.baf.yStart,
-      baf_y_end: this.baf.yEnd,
-      log2_y_start: this.log2.yStart,
-      log2_y_end: this.log2.yEnd,
-      overview: 'True',
-      reduce_data: 1
-    })
-    for (const [chrom, res] of Object.entries(covData.results)) {
+    // query gens for coverage values and draw each chromosome as it arrives
+    const drawnChroms = new Set()
+    try {
+      await stream('get-multiple-coverages', {
+        sample_id: this.sampleName,
+        genome_build: this.genomeBuild,
+        plot_height: this.plotHeight,
+        chromosome_pos: this.chromPos,
+        top_bottom_padding: this.topBottomPadding,
+        baf_y_start: this.baf.yStart,
+        baf_y_end: this.baf.yEnd,
+        log2_y_start: this.log2.yStart,
+        log2_y_end: this.log2.yEnd,
+        overview: 'True',
+        reduce_data: 1,
+        reduce_method: 'envelope'
+      }, res => {
+        if (res.status === 'error') {
+          console.error(`Could not get coverage for chromosome ${res.chromosome}: ${res.detail}`)
+          return
+        }
+        drawnChroms.add(res.chromosome)
+        this.drawOverviewPlotSegment({
+          canvas: this.staticCanvas,
+          chrom: res.chromosome,
+          width: this.dims[res.chromosome].width,
+          chromCovData: res
+        })
+      })
+    } catch (error) {
+      console.error('Could not get overview coverage', error)
+    }
+    // chromosomes without coverage, such as after a failed request, are
+    // drawn as chromosomes without data
+    CHROMOSOMES.forEach((chrom, idx) => {
+      if (drawnChroms.has(chrom)) return
       this.drawOverviewPlotSegment({
         canvas: this.staticCanvas,
-        chrom: chrom,
+        chrom,
         width: this.dims[chrom].width,
-        chromCovData: res
+        chromCovData: { ...this.chromPos[idx], chrom, data: [], baf: [] }
       })
-    }
+    })
   }
 }
@@ -48,6 +48,7 @@ export class AnnotationTrack extends BaseAnnotationTrack {
     this.sourceList.addEventListener('change', () => {
       this.expanded = false
       this.additionalQueryParams = { source: this.sourceList.value }
+      this.regionData = null
       const region = parseRegionDesignation(document.getElementById('region-field').value)
       this.drawTrack({ forceRedraw: true, ...region })
     })
@@ -88,6 +89,44 @@ export class AnnotationTrack extends BaseAnnotationTrack {
       })
   }
 
+  // Get annotations of a region, reusing the latest region if it covers it
+  async getRegionData ({ chrom, start, end }) {
+    const cached = this.regionData
+    // counts of annotations are reused as long as the bins are not too coarse
+    if (!cached || cached.chromosome !== chrom ||
+        start < cached.start_pos || end > cached.end_pos ||
+        (cached.density && cached.end_pos - cached.start_pos > 2 * (end - start))) {
+      this.regionData = await get(this.apiEntrypoint, {
+        region: `${chrom}:${start}-${end}`,
+        genome_build: this.genomeBuild,
+        collapsed: false, // allways get all height orders
+        ...this.additionalQueryParams
+      })
+    }
+    return this.regionData
+  }
+
+  // Draws the number of annotations in bins as a histogram
+  drawDensity ({ density, start_pos: regionStart }) {
+    const scale = this.offscreenPosition.scale
+    const maxCount = Math.max(...density.counts)
+    const baseline = this.tracksYPos(1) + this.featureHeight / 2
+    density.counts.forEach((count, binIdx) => {
+      if (count === 0) return
+      const height = Math.max(1, (this.featureHeight / 2) * count / maxCount)
+      drawRect({
+        ctx: this.drawCtx,
+        x: scale * (regionStart + binIdx * density.bin_size - this.offscreenPosition.start),
+        y: baseline - height,
+        width: Math.max(1, scale * density.bin_size),
+        height: height,
+        lineWidth: 1,
+        fillColor: 'grey',
+        open: false
+      })
+    })
+  }
+
   // Draws annotations in given range
   async drawOffScreenTrack ({ startPos, endPos, maxHeightOrder, data }) {
     const textSize = 10
@@ -107,6 +146,22 @@ export class AnnotationTrack extends BaseAnnotationTrack {
       latestTrackEnd: 0 // Latest annotations title's end position
     }
 
+    // annotations of wide regions are returned as counts per bin,
+    // get the annotations of the drawn region when zoomed in
+    if (data.density && (startPos > data.start_pos || endPos < data.end_pos)) {
+      data = await this.getRegionData({
+        chrom: data.chromosome,
+        start: Math.max(data.start_pos, Math.round(startPos)),
+        end: Math.min(data.end_pos, Math.round(endPos))
+      })
+    }
+    if (data.density) {
+      this.setContainerHeight(data.density.counts.some(count => count > 0) ? 1 : 0)
+      this.clearTracks()
+      this.drawDensity(data)
+      return
+    }
+
     // limit drawing of transcript to pre-defined resolutions
     let filteredAnnotations = []
     if (this.getResolution < this.maxResolution + 1) {
@@ -121,7 +176,7 @@ export class AnnotationTrack extends BaseAnnotationTrack {
     // dont show tracks with no data in them
     if (filteredAnnotations.length > 0) {
       //  Set needed height of visible canvas and transcript tooltips
-      this.setContainerHeight(this.trackData.max_height_order)
+      this.setContainerHeight(data.max_height_order)
     } else {
       //  Set needed height of visible canvas and transcript tooltips
       this.setContainerHeight(0)
@@ -1,6 +1,7 @@
 // Transcript definition
 
 import { BaseAnnotationTrack, lightenColor } from './base.js'
+import { get } from '../fetch.js'
 import { initTrackTooltips, createTooltipElement, createHtmlList, makeVirtualDOMElement, updateVisableElementCoordinates } from './tooltip.js'
 import { createPopper } from '@popperjs/core'
 import { drawRect, drawLine, drawArrow, drawText } from '../draw.js'
@@ -9,7 +10,8 @@ import { getVisibleXCoordinates, isElementOverlapping } from './utils.js'
 // add feature information to tooltipElement
 function addFeatures (elem, tooltipElement) {
   const body = tooltipElement.querySelector('ul')
-  for (const feature of elem.features) {
+  // features are not included in zoomed out views
+  for (const feature of elem.features || []) {
     // divide and conquer
     const featureContainer = document.createElement('div')
     featureContainer.id = `feature-${feature.exon_number}`
@@ -182,8 +184,10 @@ export class TranscriptTrack extends BaseAnnotationTrack {
           transcriptObj.features.push(featureObj)
         }
       }
-      transcriptObj.y1 = Math.min(...transcriptObj.features.map(feat => feat.y1))
-      transcriptObj.y2 = Math.max(...transcriptObj.features.map(feat => feat.y2))
+      if (transcriptObj.features.length > 0) {
+        transcriptObj.y1 = Math.min(...transcriptObj.features.map(feat => feat.y1))
+        transcriptObj.y2 = Math.max(...transcriptObj.features.map(feat => feat.y2))
+      }
     }
 
     // adapt coordinates to global screen coordinates from coorinates local to canvas
@@ -233,6 +237,20 @@ export class TranscriptTrack extends BaseAnnotationTrack {
     return transcriptObj
   }
 
+  // Get transcripts with exons and UTRs of a region
+  async getDetailedData ({ chrom, start, end }) {
+    const detail = this.detailData
+    if (!detail || detail.chromosome !== chrom ||
+        start < detail.start_pos || end > detail.end_pos) {
+      this.detailData = await get(this.apiEntrypoint, {
+        region: `${chrom}:${start}-${end}`,
+        genome_build: this.genomeBuild,
+        collapsed: false // allways get all height orders
+      })
+    }
+    return this.detailData
+  }
+
   //  Draws transcripts in given range
   async drawOffScreenTrack ({ startPos, endPos, maxHeightOrder, data }) {
     //    store positions used when rendering the canvas
@@ -253,6 +271,19 @@ export class TranscriptTrack extends BaseAnnotationTrack {
       latestTrackEnd: 0 // Latest annotations title's end position
     }
 
+    // exons and UTRs are left out of the transcripts of zoomed out regions,
+    // get them for the drawn region when they are needed. The server decides
+    // if the region is small enough to include them.
+    let drawExons = this.getResolution < 4
+    if (drawExons && !data.with_features) {
+      data = await this.getDetailedData({
+        chrom: data.chromosome,
+        start: Math.max(1, startPos),
+        end: Math.min(data.end_pos, endPos)
+      })
+      drawExons = data.with_features
+    }
+
     // limit drawing of transcript to pre-defined resolutions
     let filteredTranscripts = []
     if (this.getResolution < this.maxResolution + 1) {
@@ -279,7 +310,6 @@ export class TranscriptTrack extends BaseAnnotationTrack {
     // Go through queryResults and draw appropriate symbols
     const drawGeneName = this.getResolution < 3
     const drawTooltips = this.getResolution < 4
-    const drawExons = this.getResolution < 4
     for (const transc of filteredTranscripts) {
       if (!this.expanded && transc.height_order !== 1) { continue }
       // draw base transcript
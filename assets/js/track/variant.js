@@ -84,6 +84,9 @@ export class VariantTrack extends BaseAnnotationTrack {
           { start: variant.position, end: variant.end },
           { start: startPos, end: endPos }))
     }
+    if (data.truncated) {
+      console.warn(`Showing the ${data.variants.length} highest ranked variants`)
+    }
     // dont show tracks with no data in them
     if (filteredVariants.length > 0 &&
          this.getResolution < this.maxResolution + 1
@@ -1,5 +1,4 @@
 """API entry point and helper functions."""
-import gzip
 import json
 import logging
 import os
@@ -9,20 +8,32 @@ from typing import List
 import attr
 import cattr
 import connexion
-from flask import abort, current_app, jsonify, request
-
-from gens.db import (ANNOTATIONS_COLLECTION, TRANSCRIPTS_COLLECTION,
-                     VariantCategory, get_chromosome_size,
-                     query_records_in_region, query_sample, query_variants)
-from gens.exceptions import RegionParserException
+from flask import (Response, abort, copy_current_request_context, current_app,
+                   jsonify, request)
+
+from gens.db import (ANNOTATIONS_COLLECTION, CHROMSIZES_COLLECTION,
+                     TRANSCRIPTS_COLLECTION, VariantCategory,
+                     get_chromosome_size, query_gene_names, query_gene_region,
+                     query_records_in_region, query_region_density,
+                     query_sample, query_variants)
+from gens.exceptions import GraphException, RegionParserException
 from gens.graph import (REQUEST, get_cov, overview_chrom_dimensions,
                         parse_region_str)
 
-from .constants import CHROMOSOMES, GENOME_BUILDS
-from .io import get_tabix_files
+from .conditional import (conditional, request_sample, sample_versions,
+                          update_versions)
+from .constants import (CHROMOSOMES, FEATURE_RESOLUTIONS, GENOME_BUILDS,
+                        REDUCE_METHODS)
+from .io import (BINARY_MIMETYPE, NDJSON_MIMETYPE, encode_binary,
+                 get_tabix_files, read_overview_file)
+from .prefetch import prefetch_regions, prefetcher, warm_coverage
+from .store import get_store_files
+from .workers import WorkerPool
 
 LOG = logging.getLogger(__name__)
 
+coverage_pool = WorkerPool("gens-coverage", "COVERAGE_WORKERS", max_workers=8)
+
 
 @attr.s(auto_attribs=True, frozen=True)
 class ChromosomePosition:
@@ -64,6 +75,7 @@ class ChromCoverageRequest:
     overview: bool
     reduce_data: float = attr.ib()
     chromosome_pos: List[ChromosomePosition]
+    reduce_method: str = attr.ib(default="fraction")
 
     @genome_build.validator
     def valid_genome_build(self, attribute, value):
@@ -75,7 +87,116 @@ class ChromCoverageRequest:
         if not 0 <= value <= 1:
             raise ValueError(f"{value} is not within 0-1")
 
+    @reduce_method.validator
+    def valid_reduce_method(self, attribute, value):
+        if not value in REDUCE_METHODS:
+            raise ValueError(f"{value} is not a valid method; {REDUCE_METHODS}")
+
+
+def _get_data_files(sample_obj):
+    """Open the coverage and BAF files of a sample with its storage backend."""
+    if sample_obj.backend == "mmap":
+        return get_store_files(sample_obj.coverage_file, sample_obj.baf_file)
+    return get_tabix_files(sample_obj.coverage_file, sample_obj.baf_file)
+
+
+def _get_chrom_coverage(req, x_ampl, sample_obj, json_data=None):
+    """Get coverage for a chromosome using the data files of the current thread."""
+    cov_file, baf_file = None, None
+    if json_data is None:
+        cov_file, baf_file = _get_data_files(sample_obj)
+    return get_cov(
+        req,
+        x_ampl,
+        json_data=json_data,
+        cov_fh=cov_file,
+        baf_fh=baf_file,
+        bin_sizes=sample_obj.bin_sizes,
+    )
+
+
+def _response_format():
+    """Get requested response format from the format parameter or Accept header."""
+    if "format" in request.args:
+        return request.args["format"]
+    mimetypes = {BINARY_MIMETYPE: "binary", NDJSON_MIMETYPE: "ndjson"}
+    return mimetypes.get(request.accept_mimetypes.best, "json")
+
+
+def _coverage_response(**payload):
+    """Respond with coverage as json or in the binary format if requested."""
+    if _response_format() == "binary":
+        return Response(encode_binary(payload), mimetype=BINARY_MIMETYPE)
+    return jsonify(**payload)
 
+
+def _format_chrom_coverage(req, region, log2_rec, baf_rec):
+    """Format coverage of a chromosome for the response."""
+    return {
+        "data": log2_rec,
+        "baf": baf_rec,
+        "chrom": region.chrom,
+        "x_pos": round(req.x_pos),
+        "y_pos": round(req.y_pos),
+        "start": region.start_pos,
+        "end": region.end_pos,
+    }
+
+
+def _stream_coverages(jobs):
+    """Yield coverage of each chromosome as newline delimited json when ready.
+
+    Chromosomes are yielded in the requested order and chromosomes that could
+    not be read are yielded as error records.
+    """
+    pending = [future for *_, future in jobs]
+    try:
+        for chrom_info, req, future in jobs:
+            pending.remove(future)
+            chromosome = chrom_info.region.split(":")[0]
+            try:
+                reg, *_, log2_rec, baf_rec = future.result()
+            # graph errors are not subclasses of Exception
+            except GraphException as err:
+                yield _stream_error(chromosome, err)
+                continue
+            except Exception as err:
+                yield _stream_error(chromosome, err)
+                continue
+            record = {
+                "chromosome": chromosome,
+                **_format_chrom_coverage(req, reg, log2_rec, baf_rec),
+            }
+            yield json.dumps({**record, "status": "ok"}) + "\n"
+    finally:
+        # stop reading chromosomes if streaming is aborted
+        _cancel_jobs(pending)
+
+
+def _stream_error(chromosome, err):
+    """Format an error of a chromosome as a newline delimited json record."""
+    LOG.error(f"{type(err).__name__} - {err}")
+    record = {"chromosome": chromosome, "detail": str(err), "status": "error"}
+    return json.dumps(record) + "\n"
+
+
+def _cancel_jobs(futures):
+    """Cancel jobs that have not started."""
+    for future in futures:
+        future.cancel()
+
+
+def _region_versions(*track_types):
+    """Get versions of tracks and the data used for parsing regions."""
+    return update_versions(CHROMSIZES_COLLECTION, TRANSCRIPTS_COLLECTION, *track_types)
+
+
+def _coverage_versions(sample_id, genome_build, **kwargs):
+    """Get versions of the data used for coverage of a sample."""
+    return [*sample_versions(sample_id, genome_build), *_region_versions()]
+
+
+@conditional(lambda **kwargs: update_versions(CHROMSIZES_COLLECTION))
 def get_overview_chrom_dim(x_pos, y_pos, plot_width, genome_build):
     """
     Returns the dimensions of all chromosome graphs in screen coordinates
@@ -88,6 +209,7 @@ def get_overview_chrom_dim(x_pos, y_pos, plot_width, genome_build):
     return jsonify(status="ok", chrom_dims=chrom_dims)
 
 
+@conditional(lambda **kwargs: update_versions(ANNOTATIONS_COLLECTION))
 def get_annotation_sources(genome_build):
     """
     Returns available annotation source files
@@ -98,6 +220,7 @@ def get_annotation_sources(genome_build):
     return jsonify(status="ok", sources=sources)
 
 
+@conditional(lambda **kwargs: _region_versions(ANNOTATIONS_COLLECTION))
 def get_annotation_data(region, source, genome_build, collapsed):
     """
     Gets annotation data in requested region and converts the coordinates
@@ -111,6 +234,31 @@ def get_annotation_data(region, source, genome_build, collapsed):
     genome_build = request.args.get("genome_build", "38")
     res, chrom, start_pos, end_pos = parse_region_str(region, genome_build)
 
+    # return the number of annotations in bins of wide regions
+    if end_pos - start_pos > current_app.config.get("ANNOTATION_DENSITY_SPAN", 20e6):
+        counts = query_region_density(
+            record_type=ANNOTATIONS_COLLECTION,
+            chrom=chrom,
+            start_pos=start_pos,
+            end_pos=end_pos,
+            genome_build=genome_build,
+            n_bins=current_app.config.get("ANNOTATION_DENSITY_BINS", 1000),
+            source=source,
+        )
+        return jsonify(
+            status="ok",
+            chromosome=chrom,
+            start_pos=start_pos,
+            end_pos=end_pos,
+            annotations=[],
+            density={
+                "bin_size": (end_pos - start_pos + 1) / len(counts),
+                "counts": counts.tolist(),
+            },
+            max_height_order=1,
+            res=res,
+        )
+
     # Get annotations within span [start_pos, end_pos] or annotations that
     # go over the span
     annotations = list(
@@ -138,6 +286,7 @@ def get_annotation_data(region, source, genome_build, collapsed):
     )
 
 
+@conditional(lambda **kwargs: _region_versions())
 def get_transcript_data(region, genome_build, collapsed):
     """
     Gets transcript data for requested region and converts the coordinates to
@@ -150,6 +299,8 @@ def get_transcript_data(region, genome_build, collapsed):
         LOG.error(msg)
         retrun (jsonify({"detail": msg}), 404)
 
+    # exons and UTRs are only returned at resolutions where they can be drawn
+    with_features = res in FEATURE_RESOLUTIONS
     # Get transcripts within span [start_pos, end_pos] or transcripts that go over the span
     transcripts = list(
         query_records_in_region(
@@ -159,6 +310,7 @@ def get_transcript_data(region, genome_build, collapsed):
             end_pos=end_pos,
             genome_build=genome_build,
             height_order=1 if collapsed else None,
+            exclude_fields=() if with_features else ("features",),
         )
     )
     # Calculate maximum height order
@@ -171,40 +323,60 @@ def get_transcript_data(region, genome_build, collapsed):
         end_pos=end_pos,
         max_height_order=max_height_order,
         res=res,
+        with_features=with_features,
         transcripts=list(transcripts),
     )
 
 
 def search_annotation(query: str, genome_build, annotation_type):
     """Search for anntations of genes and return their position."""
+    if not (genome_build and int(genome_build) in GENOME_BUILDS):
+        genome_build = None
     # Lookup queried element
-    collection = current_app.config["GENS_DB"][annotation_type]
-    db_query = {"gene_name": re.compile("^" + re.escape(query) + "$", re.IGNORECASE)}
-
-    if genome_build and int(genome_build) in GENOME_BUILDS:
-        db_query["genome_build"] = genome_build
+    if annotation_type == TRANSCRIPTS_COLLECTION:
+        region = query_gene_region(query, genome_build)
+    else:
+        collection = current_app.config["GENS_DB"][annotation_type]
+        db_query = {
+            "gene_name": re.compile("^" + re.escape(query) + "$", re.IGNORECASE)
+        }
+        if genome_build is not None:
+            db_query["genome_build"] = genome_build
+        elements = list(collection.find(db_query, sort=[("start", 1), ("chrom", 1)]))
+        region = None
+        if len(elements) > 0:
+            region = {
+                "chrom": elements[0].get("chrom"),
+                "start": elements[0].get("start"),
+                "end": max(elem.get("end") for elem in elements),
+                "genome_build": elements[0].get("genome_build"),
+            }
 
-    elements = list(collection.find(db_query, sort=[("start", 1), ("chrom", 1)]))
     # if no results was found
-    if len(elements) == 0:
+    if region is None:
         msg = f"Did not find gene name: {query}"
         LOG.warning(msg)
         data = {"message": msg}
         response_code = 404
     else:
-        start_elem = elements[0]
-        end_elem = max(elements[0:], key=lambda elem: elem.get("end"))
         data = {
-            "chromosome": start_elem.get("chrom"),
-            "start_pos": start_elem.get("start"),
-            "end_pos": end_elem.get("end"),
-            "genome_build": start_elem.get("genome_build"),
+            "chromosome": region["chrom"],
+            "start_pos": region["start"],
+            "end_pos": region["end"],
+            "genome_build": region["genome_build"],
         }
         response_code = 200
 
     return jsonify({**data, "status": response_code})
 
 
+@conditional(lambda **kwargs: update_versions(TRANSCRIPTS_COLLECTION))
+def autocomplete_gene_name(prefix: str, genome_build=None, limit=10):
+    """Get names of genes starting with prefix."""
+    gene_names = query_gene_names(prefix, genome_build, limit) if prefix else []
+    return jsonify(status="ok", gene_names=gene_names)
+
+
 def get_variant_data(sample_id, variant_category, **optional_kwargs):
     """Search Scout database for variants associated with a case and return info in JSON format."""
     default_height_order = 0
@@ -228,24 +400,33 @@ def get_variant_data(sample_id, variant_category, **optional_kwargs):
             "max_height_order": default_height_order,
         }
         # limit renders to b or greater resolution
-    # query variants
+    # query variants, one more than the cap to detect truncated results
+    max_variants = current_app.config.get("MAX_VARIANTS", 10000)
     try:
         variants = list(
             query_variants(
                 sample_id,
                 cattr.structure(variant_category, VariantCategory),
+                limit=max_variants + 1,
                 **region_params,
             )
         )
     except ValueError as err:
         return (jsonify({"detail": str(err)}), 404)
-    # return all detected variants
+    truncated = len(variants) > max_variants
+    if truncated:
+        LOG.warning(
+            f"Returning the {max_variants} highest ranked variants of {sample_id}"
+        )
+        variants = variants[:max_variants]
+    # return detected variants
     return (
         jsonify(
             {
                 **base_return,
-                "variants": list(variants),
+                "variants": variants,
                 "max_height_order": 1,
+                "truncated": truncated,
             }
         ),
         200,
@@ -264,18 +445,17 @@ def get_multiple_coverages():
     db = current_app.config["GENS_DB"]
     sample_obj = query_sample(db, data.sample_id, data.genome_build)
     # Try to find and load an overview json data file
-    json_data, cov_file, baf_file = None, None, None
+    json_data = None
     if sample_obj.overview_file and os.path.isfile(sample_obj.overview_file):
         LOG.info(f"Using json overview file: {sample_obj.overview_file}")
-        with gzip.open(sample_obj.overview_file, "r") as json_gz:
-            json_data = json.loads(json_gz.read().decode("utf-8"))
+        json_data = read_overview_file(sample_obj.overview_file)
     else:
         # Fall back to BED files if json files does not exists
-        cov_file, baf_file = get_tabix_files(
-            sample_obj.coverage_file, sample_obj.baf_file
-        )
+        # verify that they can be opened before fanning out
+        _get_data_files(sample_obj)
 
-    results = {}
+    # Get coverage for each chromosome concurrently
+    jobs = []
     for chrom_info in data.chromosome_pos:
         # Set some input values
         req = REQUEST(
@@ -290,39 +470,44 @@ def get_multiple_coverages():
             data.log2_y_end,
             data.genome_build,
             data.reduce_data,
+            data.reduce_method,
+        )
+        future = coverage_pool.submit(
+            copy_current_request_context(_get_chrom_coverage),
+            req,
+            chrom_info.x_ampl,
+            sample_obj,
+            json_data=json_data,
         )
+        jobs.append((chrom_info, req, future))
+
+    # Stream each chromosome as soon as it has been read
+    if _response_format() == "ndjson":
+        return Response(_stream_coverages(jobs), mimetype=NDJSON_MIMETYPE)
+
+    # Gather results in the order of the requested chromosomes
+    results = {}
+    for chrom_info, req, future in jobs:
         chromosome = chrom_info.region.split(":")[0]
         try:
-            with current_app.app_context():
-                reg, *_, log2_rec, baf_rec = get_cov(
-                    req,
-                    chrom_info.x_ampl,
-                    json_data=json_data,
-                    cov_fh=cov_file,
-                    baf_fh=baf_file,
-                )
+            reg, *_, log2_rec, baf_rec = future.result()
         except RegionParserException as err:
             LOG.error(f"{type(err).__name__} - {err}")
+            _cancel_jobs(future for *_, future in jobs)
             return (jsonify({"detail": str(err)}), 416)
         except Exception as err:
             LOG.error(f"{type(err).__name__} - {err}")
+            _cancel_jobs(future for *_, future in jobs)
             return (jsonify({"detail": str(err)}), 500)
 
-        results[chromosome] = {
-            "data": log2_rec,
-            "baf": baf_rec,
-            "chrom": reg.chrom,
-            "x_pos": round(req.x_pos),
-            "y_pos": round(req.y_pos),
-            "start": reg.start_pos,
-            "end": reg.end_pos,
-        }
-    return jsonify(
+        results[chromosome] = _format_chrom_coverage(req, reg, log2_rec, baf_rec)
+    return _coverage_response(
         results=results,
         status="ok",
     )
 
 
+@conditional(_coverage_versions, cache_control="SAMPLE_CACHE_CONTROL", vary="Accept")
 def get_coverage(
     sample_id,
     region,
@@ -337,6 +522,7 @@ def get_coverage(
     genome_build,
     reduce_data,
     x_ampl,
+    reduce_method="fraction",
 ):
     """
     Reads and formats Log2 ratio and BAF values for overview graph
@@ -361,22 +547,36 @@ def get_coverage(
         log2_y_end,
         genome_build,
         reduce_data,
+        reduce_method,
     )
-    db = current_app.config["GENS_DB"]
-    sample_obj = query_sample(db, sample_id, genome_build)
-    cov_file, baf_file = get_tabix_files(sample_obj.coverage_file, sample_obj.baf_file)
+    sample_obj = request_sample(sample_id, genome_build)
+    cov_file, baf_file = _get_data_files(sample_obj)
     # Parse region
     try:
         with current_app.app_context():
             reg, n_start, n_end, log2_rec, baf_rec = get_cov(
-                req, x_ampl, cov_fh=cov_file, baf_fh=baf_file
+                req,
+                x_ampl,
+                cov_fh=cov_file,
+                baf_fh=baf_file,
+                bin_sizes=sample_obj.bin_sizes,
+            )
+        # warm the cache with the regions that are likely to be viewed next
+        if prefetcher.enabled and sample_obj.backend == "tabix":
+            regions = prefetch_regions(
+                reg, n_start, n_end, x_ampl, sample_obj.bin_sizes
+            )
+            prefetcher.schedule(
+                (sample_id, genome_build),
+                warm_coverage,
+                [(sample_obj, *region) for region in regions],
             )
     except RegionParserException as err:
         LOG.error(f"{type(err).__name__} - {err}")
     except Exception as err:
         LOG.error(f"{type(err).__name__} - {err}")
 
-    return jsonify(
+    return _coverage_response(
         data=log2_rec,
         baf=baf_rec,
         chrom=reg.chrom,
@@ -390,10 +590,10 @@ def get_coverage(
     )
 
 
+@conditional(lambda **kwargs: update_versions(CHROMSIZES_COLLECTION))
 def get_chromosome_info(chromosome, genome_build):
     """Query the database for information on a chromosome."""
     db = current_app.config["GENS_DB"]
 
     chrom_info = get_chromosome_size(db, chromosome.upper(), genome_build)
-    del chrom_info["_id"]
     return jsonify(chrom_info)
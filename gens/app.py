@@ -11,12 +11,16 @@ from flask import abort, render_template, request
 from flask_compress import Compress
 
 from .__version__ import VERSION as version
+from .api import coverage_pool
 from .blueprints import gens_bp, home_bp
 from .cache import cache
 from .db import SampleNotFoundError, init_database
 from .errors import (generic_abort_error, generic_exception_error, sample_not_found)
 from .graph import parse_region_str
-from .io import BAF_SUFFIX, COV_SUFFIX, _get_filepath
+from .io import (BAF_SUFFIX, COV_SUFFIX, _get_filepath, overview_cache,
+                 tabix_pool, tile_cache)
+from .prefetch import prefetcher
+from .store import store_pool
 from connexion.resolver import RestyResolver
 
 dictConfig(
@@ -75,6 +79,12 @@ def initialize_extensions(app):
     """Initialize flask extensions."""
     cache.init_app(app)
     compress.init_app(app)
+    tabix_pool.init_app(app)
+    store_pool.init_app(app)
+    overview_cache.init_app(app)
+    tile_cache.init_app(app)
+    coverage_pool.init_app(app)
+    prefetcher.init_app(app)
 
 
 def register_errors(app):
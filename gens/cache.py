@@ -1,6 +1,65 @@
 """Initiate cachig for app."""
-from flask_caching import Cache
 import tempfile
+import threading
+from collections import OrderedDict
+
+from flask_caching import Cache
 
 tmp_dir = tempfile.TemporaryDirectory(prefix="gens_cache_")
 cache = Cache(config={"CACHE_TYPE": "FileSystemCache", "CACHE_DIR": tmp_dir.name})
+
+
+class MemoryCache:
+    """Thread safe in-process LRU cache bounded by a memory budget.
+
+    The size of each entry is given in bytes when it is stored and the least
+    recently used entries are evicted when the budget is exceeded.
+    """
+
+    def __init__(self, config_key, max_bytes):
+        self.config_key = config_key
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure memory budget from the app configuration."""
+        self.max_bytes = app.config.get(self.config_key, self.max_bytes)
+
+    def get(self, key, default=None):
+        """Get a cached value."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def set(self, key, value, n_bytes):
+        """Store a value that uses n_bytes of memory."""
+        with self._lock:
+            self._pop(key)
+            # entries larger than the budget are not cached
+            if n_bytes > self.max_bytes:
+                return
+            self._entries[key] = (value, n_bytes)
+            self.n_bytes += n_bytes
+            while self.n_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        """Remove a value from the cache."""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """Remove all values from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+    def _pop(self, key):
+        """Remove entry, the lock must be held by the caller."""
+        if key in self._entries:
+            _, n_bytes = self._entries.pop(key)
+            self.n_bytes -= n_bytes
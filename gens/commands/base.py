@@ -6,6 +6,7 @@ from flask.cli import FlaskGroup
 from gens.__version__ import VERSION as version
 from gens.app import create_app
 
+from .build import build_data as build_data_command
 from .index import index as index_command
 from .load import load as load_command
 from .view import view as view_command
@@ -23,6 +24,7 @@ def cli(*args, **kwargs):
     pass
 
 
+cli.add_command(build_data_command)
 cli.add_command(index_command)
 cli.add_command(load_command)
 cli.add_command(view_command)
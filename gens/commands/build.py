@@ -0,0 +1,67 @@
+"""Build data files for Gens."""
+
+import logging
+
+import click
+
+from gens.load import build_sample_data
+
+LOG = logging.getLogger(__name__)
+
+
+@click.command("build-data", short_help="Build coverage and BAF files")
+@click.option("-i", "--sample-id", type=str, required=True, help="Sample id")
+@click.option(
+    "-c",
+    "--coverage",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Standardized coverage from GATK DenoiseReadCounts",
+)
+@click.option(
+    "-g",
+    "--gvcf",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Bgzipped and tabix indexed gVCF",
+)
+@click.option(
+    "-n",
+    "--gnomad",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Chromosome and position of SNPs used for BAF",
+)
+@click.option(
+    "-o",
+    "--outdir",
+    default=".",
+    show_default=True,
+    type=click.Path(file_okay=False),
+    help="Output directory",
+)
+@click.option(
+    "-j", "--overview-json", is_flag=True, help="Write preprocessed overview coverage"
+)
+@click.option(
+    "-p",
+    "--processes",
+    type=click.IntRange(min=1),
+    help="Number of worker processes, defaults to the number of CPUs",
+)
+def build_data(sample_id, coverage, gvcf, gnomad, outdir, overview_json, processes):
+    """Build multi resolution coverage and BAF files of a sample."""
+    try:
+        files = build_sample_data(
+            sample_id,
+            coverage,
+            gvcf,
+            gnomad,
+            outdir,
+            overview=overview_json,
+            processes=processes,
+        )
+    except (OSError, ValueError) as err:
+        raise click.UsageError(f"Could not build data: {err}")
+    for path in files.values():
+        click.secho(f"Wrote {path}", fg="green")
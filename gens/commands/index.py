@@ -6,7 +6,9 @@ import click
 from flask import current_app
 from flask.cli import with_appcontext
 
-from gens.db import create_indexes, update_indexes
+from gens.db import (ANNOTATIONS_COLLECTION, TRANSCRIPTS_COLLECTION,
+                     add_missing_bins, add_missing_gene_name_keys,
+                     create_indexes, update_indexes)
 
 LOG = logging.getLogger(__name__)
 
@@ -32,3 +34,12 @@ def index(yes, update):
     else:
         create_indexes(db)
         click.secho("New indexes created", fg="green")
+    # records loaded by older versions of Gens lack the bin used in queries
+    for collection_name in [ANNOTATIONS_COLLECTION, TRANSCRIPTS_COLLECTION]:
+        n_updated = add_missing_bins(db, collection_name)
+        if n_updated > 0:
+            LOG.info(f"Added bins to {n_updated} records in {collection_name}")
+    # transcripts loaded by older versions of Gens lack the gene name key
+    n_updated = add_missing_gene_name_keys(db)
+    if n_updated > 0:
+        LOG.info(f"Added gene name keys to {n_updated} transcripts")
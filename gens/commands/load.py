@@ -1,21 +1,34 @@
+import hashlib
+import itertools
 import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
 import click
 from flask import current_app as app
 from flask.cli import with_appcontext
 from pymongo import ASCENDING
+from tabulate import tabulate
 
-from gens.constants import GENOME_BUILDS
+from gens.constants import COVERAGE_BACKENDS, GENOME_BUILDS
 from gens.db import (ANNOTATIONS_COLLECTION, CHROMSIZES_COLLECTION,
                      SAMPLES_COLLECTION, TRANSCRIPTS_COLLECTION, create_index,
-                     get_indexes, register_data_update, store_sample)
-from gens.load import (ParserError, build_chromosomes_obj, build_transcripts,
-                       get_assembly_info, parse_annotation_entry,
-                       parse_annotation_file, update_height_order)
+                     get_content_hash, get_indexes,
+                     get_samples_without_overview, register_data_update,
+                     staging_collection, store_sample, update_sample_overview)
+from gens.io import JSON_SUFFIX
+from gens.load import (build_chromosomes_obj, build_overview,
+                       build_transcripts, estimate_bin_sizes,
+                       get_annotation_name, get_assembly_info,
+                       read_annotation_file)
+from gens.store import convert_bed_to_store
 
 LOG = logging.getLogger(__name__)
 valid_genome_builds = [str(gb) for gb in GENOME_BUILDS]
+# Number of annotations or transcripts inserted into the database at a time
+INSERT_BATCH_SIZE = 10000
 
 
 @click.group()
@@ -23,6 +36,11 @@ def load():
     """Load information into Gens database"""
 
 
+def _overview_path(sample_id, coverage):
+    """Get path of an overview file written next to the coverage file."""
+    return os.path.join(os.path.dirname(coverage), sample_id + JSON_SUFFIX)
+
+
 @load.command()
 @click.option("-i", "--sample-id", type=str, required=True, help="Sample id")
 @click.option(
@@ -52,13 +70,48 @@ def load():
     type=click.Path(exists=True),
     help="Json file that contains preprocessed overview coverage",
 )
+@click.option(
+    "--build-overview",
+    "build_overview_json",
+    is_flag=True,
+    help="Build overview json from the coverage and BAF files",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(COVERAGE_BACKENDS),
+    default="tabix",
+    show_default=True,
+    help="Storage format of coverage and BAF data, bed files are converted to mmap",
+)
 @with_appcontext
-def sample(sample_id, genome_build, baf, coverage, overview_json):
-    """Load a sample into Gens database."""
+def sample(
+    sample_id, genome_build, baf, coverage, overview_json, build_overview_json, backend
+):
+    """Load a sample into Gens database.
+
+    Overview files of samples loaded without one can be built later with
+    gens load overviews.
+    """
+    if overview_json and build_overview_json:
+        raise click.UsageError("Use either --overview-json or --build-overview")
     db = app.config["GENS_DB"]
     # if collection is not indexed, crate index
     if len(get_indexes(db, SAMPLES_COLLECTION)) == 0:
         create_index(db, SAMPLES_COLLECTION)
+    # convert bed files to memory-mapped coverage stores
+    if backend == "mmap":
+        try:
+            baf = convert_bed_to_store(baf)
+            coverage = convert_bed_to_store(coverage)
+        except ValueError as err:
+            raise click.UsageError(str(err))
+    if build_overview_json:
+        overview_json = build_overview(
+            coverage, baf, _overview_path(sample_id, coverage)
+        )
+    # distance between data points of each resolution
+    bin_sizes = estimate_bin_sizes(coverage)
+    LOG.info(f"Bin sizes of {coverage}: {bin_sizes}")
     # load samples
     store_sample(
         db,
@@ -67,10 +120,79 @@ def sample(sample_id, genome_build, baf, coverage, overview_json):
         baf=baf,
         coverage=coverage,
         overview=overview_json,
+        backend=backend,
+        bin_sizes=bin_sizes,
     )
     click.secho("Finished adding a new sample to database ✔", fg="green")
 
 
+@load.command()
+@click.option("-i", "--sample-id", type=str, help="Only build overview of sample")
+@click.option(
+    "--interval",
+    type=click.IntRange(min=1),
+    help="Keep running and look for new samples every interval seconds",
+)
+@with_appcontext
+def overviews(sample_id, interval):
+    """Build overview files of samples loaded without one."""
+    db = app.config["GENS_DB"]
+    while True:
+        for sample_obj in get_samples_without_overview(db):
+            if sample_id is not None and sample_obj.sample_id != sample_id:
+                continue
+            overview_file = _overview_path(
+                sample_obj.sample_id, sample_obj.coverage_file
+            )
+            try:
+                build_overview(
+                    sample_obj.coverage_file, sample_obj.baf_file, overview_file
+                )
+            except (OSError, ValueError) as err:
+                LOG.error(f"Could not build overview of {sample_obj.sample_id}: {err}")
+                continue
+            update_sample_overview(
+                db, sample_obj.sample_id, sample_obj.genome_build, overview_file
+            )
+            click.secho(f"Built overview of {sample_obj.sample_id} ✔", fg="green")
+        if interval is None:
+            break
+        time.sleep(interval)
+
+
+def _insert_in_batches(collection, records):
+    """Insert records in unordered batches and return the number inserted."""
+    batch = []
+    n_inserted = 0
+    for record in records:
+        batch.append(record)
+        if len(batch) == INSERT_BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            n_inserted += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        n_inserted += len(batch)
+    return n_inserted
+
+
+def _content_hash(genome_build, *paths):
+    """Hash the content of files loaded for a genome build."""
+    content_hash = hashlib.sha256(str(genome_build).encode("utf-8"))
+    for path in paths:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024**2), b""):
+                content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def _read_annotation_file(annot_file, genome_build):
+    """Read an annotation file in a worker process and time it."""
+    start = time.perf_counter()
+    annotations, n_rejected = read_annotation_file(annot_file, genome_build)
+    return annotations, n_rejected, time.perf_counter() - start
+
+
 @load.command()
 @click.option(
     "-f",
@@ -86,59 +208,111 @@ def sample(sample_id, genome_build, baf, coverage, overview_json):
     required=True,
     help="Genome build",
 )
+@click.option(
+    "-p",
+    "--processes",
+    type=click.IntRange(min=1),
+    help="Number of processes reading files, defaults to the number of CPUs",
+)
+@click.option("--force", is_flag=True, help="Load files even if they have not changed")
 @with_appcontext
-def annotations(file, genome_build):
-    """Load annotations from file into the database."""
+def annotations(file, genome_build, processes, force):
+    """Load annotations from file into the database.
+
+    Annotations are loaded into a staging collection that replaces the
+    annotations collection when all files are loaded.
+    """
     db = app.config["GENS_DB"]
-    # if collection is not indexed, crate index
-    if len(get_indexes(db, ANNOTATIONS_COLLECTION)) == 0:
-        create_index(db, ANNOTATIONS_COLLECTION)
     # check if path is a directoy of a file
     path = Path(file)
     files = path.glob("*") if path.is_dir() else [path]
-    LOG.info("Processing files")
+    # verify file format
+    files = sorted(f for f in files if f.suffix in [".bed", ".aed"])
+    # skip files that have not changed since they were loaded
+    content_hashes = {}
     for annot_file in files:
-        # verify file format
-        if annot_file.suffix not in [".bed", ".aed"]:
-            continue
-        LOG.info(f"Processing {annot_file}")
-        # base the annotation name on the filename
-        annotation_name = annot_file.name[: -len(annot_file.suffix)]
-        try:
-            parser = parse_annotation_file(
-                annot_file, genome_build, file_format=annot_file.suffix[1:]
-            )
-            annotation_obj = []
-            for entry in parser:
-                try:
-                    entry_obj = parse_annotation_entry(
-                        entry, genome_build, annotation_name
-                    )
-                    annotation_obj.append(entry_obj)
-                except ParserError as err:
-                    LOG.warning(str(err))
-                    continue
-
-        except Exception as err:
-            LOG.error(f"{str(err)}")
-            raise click.UsageError(str(err))
+        annotation_name = get_annotation_name(annot_file)
+        content_hash = _content_hash(genome_build, annot_file)
+        if force or content_hash != get_content_hash(
+            ANNOTATIONS_COLLECTION, annotation_name, genome_build=int(genome_build)
+        ):
+            content_hashes[annotation_name] = content_hash
+        else:
+            LOG.info(f"Skipping {annot_file}, it has not changed since it was loaded")
+    files = [f for f in files if get_annotation_name(f) in content_hashes]
+    if len(files) == 0:
+        click.secho("All annotations are up to date ✔", fg="green")
+        return
 
-        # Remove existing annotations in database
-        LOG.info(f"Remove old entry in the database")
-        db[ANNOTATIONS_COLLECTION].delete_many({"source": annotation_name})
-        # add the annotations
-        LOG.info(f"Load annoatations in the database")
-        db[ANNOTATIONS_COLLECTION].insert_many(annotation_obj)
-        LOG.info("Update height order")
-        # update the height order of annotations in the database
-        update_height_order(db, annotation_name)
-        register_data_update(ANNOTATIONS_COLLECTION, name=annotation_name)
-    click.secho("Finished loading annotations ✔", fg="green")
+    LOG.info("Processing files")
+    load_start = time.perf_counter()
+    files = iter(files)
+    processes = processes or os.cpu_count()
+    summary = []
+    # copy the annotations that are not reloaded to the staging collection
+    reloaded = {"source": {"$in": list(content_hashes)}, "genome_build": genome_build}
+    keep = {"$nor": [reloaded]}
+    with staging_collection(db, ANNOTATIONS_COLLECTION, keep=keep) as staging:
+        with ProcessPoolExecutor(processes) as executor:
+            # limit the number of parsed files waiting in memory to be inserted
+            max_pending = 2 * processes
+            jobs = {}
+            while True:
+                for annot_file in itertools.islice(files, max_pending - len(jobs)):
+                    LOG.info(f"Processing {annot_file}")
+                    job = executor.submit(
+                        _read_annotation_file, annot_file, genome_build
+                    )
+                    jobs[job] = annot_file
+                if not jobs:
+                    break
+                done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+                for job in done:
+                    annot_file = jobs.pop(job)
+                    try:
+                        annotation_obj, n_rejected, parse_time = job.result()
+                    except Exception as err:
+                        LOG.error(f"{str(err)}")
+                        raise click.UsageError(f"{annot_file}: {err}")
+                    insert_start = time.perf_counter()
+                    LOG.info(
+                        f"Load annoatations of {annot_file.name} in the database"
+                    )
+                    n_loaded = _insert_in_batches(staging, annotation_obj)
+                    insert_time = time.perf_counter() - insert_start
+                    summary.append(
+                        (
+                            annot_file.name,
+                            n_loaded,
+                            n_rejected,
+                            parse_time,
+                            insert_time,
+                        )
+                    )
+    for annotation_name, content_hash in content_hashes.items():
+        register_data_update(
+            ANNOTATIONS_COLLECTION,
+            name=annotation_name,
+            content_hash=content_hash,
+            genome_build=int(genome_build),
+        )
+    columns = ("File", "Annotations", "Rejected", "Parsing (s)", "Loading (s)")
+    click.echo(tabulate(summary, headers=columns, floatfmt=".1f"))
+    load_time = time.perf_counter() - load_start
+    click.secho(f"Finished loading annotations in {load_time:.1f}s ✔", fg="green")
 
 
 @load.command()
-@click.option("-f", "--file", type=click.File(), help="Transcript file")
-@click.option("-m", "--mane", type=click.File(), required=True, help="Mane file")
+@click.option(
+    "-f",
+    "--file",
+    required=True,
+    type=click.Path(exists=True),
+    help="Transcript file in gtf format, optionally gzipped",
+)
+@click.option(
+    "-m", "--mane", type=click.Path(exists=True), required=True, help="Mane file"
+)
 @click.option(
     "-b",
     "--genome-build",
@@ -146,21 +320,38 @@ def annotations(file, genome_build):
     required=True,
     help="Genome build",
 )
+@click.option("--force", is_flag=True, help="Load files even if they have not changed")
 @with_appcontext
-def transcripts(file, mane, genome_build):
-    """Load transcripts into the database."""
+def transcripts(file, mane, genome_build, force):
+    """Load transcripts into the database.
+
+    Transcripts are loaded into a staging collection that replaces the
+    transcripts collection when all transcripts are loaded.
+    """
     db = app.config["GENS_DB"]
-    # if collection is not indexed, crate index
-    if len(get_indexes(db, TRANSCRIPTS_COLLECTION)) > 0:
-        create_index(db, TRANSCRIPTS_COLLECTION)
-    LOG.info("Building transcript object")
-    try:
-        transcripts = build_transcripts(file, mane, genome_build)
-    except Exception as err:
-        raise click.UsageError(str(err))
-    LOG.info("Add transcripts to database")
-    db[TRANSCRIPTS_COLLECTION].insert_many(transcripts)
-    register_data_update(TRANSCRIPTS_COLLECTION)
+    content_hash = _content_hash(genome_build, file, mane)
+    if not force and content_hash == get_content_hash(
+        TRANSCRIPTS_COLLECTION, genome_build=int(genome_build)
+    ):
+        click.secho("Transcripts are up to date ✔", fg="green")
+        return
+    # copy transcripts of other genome builds to the staging collection
+    keep = {"genome_build": {"$ne": int(genome_build)}}
+    with staging_collection(db, TRANSCRIPTS_COLLECTION, keep=keep) as staging:
+        LOG.info("Building transcript objects and adding them to the database")
+        try:
+            with open(mane) as mane_file:
+                n_loaded = _insert_in_batches(
+                    staging, build_transcripts(file, mane_file, genome_build)
+                )
+        except Exception as err:
+            raise click.UsageError(str(err))
+    LOG.info(f"Added {n_loaded} transcripts to the database")
+    register_data_update(
+        TRANSCRIPTS_COLLECTION,
+        content_hash=content_hash,
+        genome_build=int(genome_build),
+    )
     click.secho("Finished loading transcripts ✔", fg="green")
 
 
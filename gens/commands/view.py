@@ -40,6 +40,7 @@ def samples(summary):
             "baf file",
             "cov file",
             "overview_file",
+            "backend",
         )
         sample_tbl = (
             (
@@ -49,6 +50,7 @@ def samples(summary):
                 s.baf_file,
                 s.coverage_file,
                 s.overview_file,
+                s.backend,
             )
             for s in samples
         )
@@ -0,0 +1,123 @@
+"""Conditional HTTP responses with ETag and Last-Modified validators.
+
+Validators are computed from the versions of the data a response is built
+from, such as the modification time of sample files and the timestamps of
+the updates collection. Requests with matching validators are answered with
+304 Not Modified without building the response.
+"""
+import datetime
+import functools
+import hashlib
+import logging
+import os
+
+from flask import current_app, g, make_response, request
+
+from .__version__ import VERSION
+from .db import get_latest_update, query_sample
+
+LOG = logging.getLogger(__name__)
+
+
+def _to_utc(timestamp):
+    """Make naive timestamps from the database timezone aware."""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp
+
+
+def update_versions(*track_types):
+    """Get versions of tracks from when they were last updated."""
+    db = current_app.config["GENS_DB"]
+    versions = []
+    for track_type in track_types:
+        timestamp = get_latest_update(db, track_type)
+        if timestamp is not None:
+            timestamp = _to_utc(timestamp)
+        versions.append(((track_type, timestamp), timestamp))
+    return versions
+
+
+def file_versions(*paths):
+    """Get versions of files from their modification time and size."""
+    versions = []
+    for path in paths:
+        stat = os.stat(path)
+        modified = datetime.datetime.fromtimestamp(
+            stat.st_mtime, datetime.timezone.utc
+        )
+        versions.append(((path, stat.st_mtime_ns, stat.st_size), modified))
+    return versions
+
+
+def request_sample(sample_id, genome_build):
+    """Get a sample that is read once per request.
+
+    The sample is shared between the validators and the endpoint.
+    """
+    samples = g.setdefault("samples", {})
+    key = (sample_id, genome_build)
+    if key not in samples:
+        db = current_app.config["GENS_DB"]
+        samples[key] = query_sample(db, sample_id, genome_build)
+    return samples[key]
+
+
+def sample_versions(sample_id, genome_build):
+    """Get versions of the sample and its data files."""
+    sample_obj = request_sample(sample_id, genome_build)
+    paths = [sample_obj.coverage_file, sample_obj.baf_file]
+    if sample_obj.overview_file is not None:
+        paths.append(sample_obj.overview_file)
+    return [
+        ((sample_id, genome_build), _to_utc(sample_obj.created_at)),
+        *file_versions(*paths),
+    ]
+
+
+def _not_modified(etag, last_modified):
+    """Check if the validators of a conditional request match."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(get_versions, cache_control="REFERENCE_CACHE_CONTROL", vary=None):
+    """Add validators to responses and answer conditional requests.
+
+    get_versions is called with the arguments of the endpoint and returns a
+    list of (version, modification time) of the data used by the endpoint.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(*args, **kwargs)
+            # responses differ between versions of Gens and on the vary header
+            keys = [VERSION, request.headers.get(vary) if vary else None]
+            keys.extend(version for version, _ in versions)
+            etag = hashlib.sha1(repr(keys).encode("utf-8")).hexdigest()
+            modified = [mtime for _, mtime in versions if mtime is not None]
+            last_modified = max(modified) if modified else None
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = current_app.config.get(
+                cache_control, "no-cache"
+            )
+            if vary is not None:
+                response.vary.add(vary)
+            return response
+
+        return wrapper
+
+    return decorator
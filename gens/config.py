@@ -5,6 +5,52 @@ MONGODB_PORT = 27017
 GENS_DBNAME = "gens"
 SCOUT_DBNAME = "scout"
 
+# Number of open tabix files kept per worker thread
+TABIX_POOL_SIZE = 32
+# Number of opened memory-mapped coverage stores kept per process
+STORE_POOL_SIZE = 32
+
+# Memory budget in bytes for caching parsed overview files
+OVERVIEW_CACHE_SIZE = 256 * 1024**2
+
+# Memory budget in bytes for caching genomic tiles of tabix files
+TILE_CACHE_SIZE = 512 * 1024**2
+
+# Number of threads used for reading coverage of multiple chromosomes
+COVERAGE_WORKERS = 8
+
+# Keep annotations and transcripts in in-memory interval indexes per chromosome
+ANNOTATION_INDEX = False
+# Annotations of regions wider than this are returned as counts per bin
+ANNOTATION_DENSITY_SPAN = 20 * 10**6
+ANNOTATION_DENSITY_BINS = 1000
+# Maximum number of variants returned for a track, highest rank score first
+MAX_VARIANTS = 10000
+
+# Prefetch coverage next to the viewed region in background threads
+COVERAGE_PREFETCH = False
+PREFETCH_WORKERS = 2
+# Maximum number of queued prefetch jobs
+PREFETCH_QUEUE_SIZE = 16
+
+# Cache-Control header of responses with sample data and with reference data,
+# responses are revalidated using their ETag and Last-Modified headers
+SAMPLE_CACHE_CONTROL = "private, no-cache"
+REFERENCE_CACHE_CONTROL = "public, no-cache"
+
+# Response types compressed by flask-compress, includes binary coverage
+COMPRESS_MIMETYPES = [
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "application/octet-stream",
+]
+
 # Annotation
 DEFAULT_ANNOTATION_TRACK = (
     "Mimisbrunnr_databank_plausibly_pathogenic_CNVs_Lund_hg38.aed"
@@ -28,3 +28,15 @@ CHROMOSOMES = (
 )
 
 GENOME_BUILDS = (37, 38)
+
+# Storage formats for sample coverage and BAF data
+COVERAGE_BACKENDS = ("tabix", "mmap")
+
+# Methods for reducing the number of coverage data points
+REDUCE_METHODS = ("fraction", "envelope")
+
+# Distance in base pairs between data points at each resolution
+RESOLUTION_BIN_SIZES = {"o": 100000, "a": 25000, "b": 5000, "c": 1000, "d": 100}
+
+# Resolutions where exons and UTRs of transcripts are returned
+FEATURE_RESOLUTIONS = ("c", "d")
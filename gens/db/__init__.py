@@ -1,12 +1,18 @@
 from .annotation import ANNOTATIONS as ANNOTATIONS_COLLECTION
 from .annotation import TRANSCRIPTS as TRANSCRIPTS_COLLECTION
-from .annotation import (VariantCategory, get_timestamps,
-                         query_records_in_region, query_variants,
-                         register_data_update)
+from .annotation import (VariantCategory, add_missing_bins,
+                         add_missing_gene_name_keys, gene_name_key,
+                         get_content_hash, get_latest_update, get_timestamps,
+                         query_gene_names, query_gene_region,
+                         query_records_in_region, query_region_density,
+                         query_variants, region_bin, register_data_update)
 from .chrom_sizes import CHROMSIZES as CHROMSIZES_COLLECTION
-from .chrom_sizes import get_chromosome_size
+from .chrom_sizes import get_chromosome_size, get_chromosome_sizes
 from .db import init_database_connection as init_database
 from .index import create_index, create_indexes, get_indexes, update_indexes
 from .samples import COLLECTION as SAMPLES_COLLECTION
-from .samples import (SampleNotFoundError, get_samples, query_sample,
-                      store_sample)
+from .samples import (SampleNotFoundError, get_samples,
+                      get_samples_without_overview, query_sample, store_sample,
+                      update_sample_overview)
+from .staging import (create_staging_collection, replace_with_staging,
+                      staging_collection)
@@ -2,11 +2,15 @@
 
 import datetime
 import logging
-from collections import defaultdict
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
 from itertools import groupby
 
 from flask import current_app as app
 
+from .intervals import IntervalIndex, density_from_counts, interval_density
 from .models import VariantCategory
 
 LOG = logging.getLogger(__name__)
@@ -16,14 +20,118 @@ ANNOTATIONS = "annotations"
 TRANSCRIPTS = "transcripts"
 UPDATES = "updates"
 
+# UCSC binning scheme with bins of 128kb, 1Mb, 8Mb, 64Mb and 512Mb
+BIN_OFFSETS = (4681, 585, 73, 9, 1)
+BIN_FIRST_SHIFT = 17
+BIN_NEXT_SHIFT = 3
+BIN_MAX_POS = (1 << 29) - 1
 
-def register_data_update(track_type, name=None):
-    """Register that a track was updated."""
+# Seconds between checks for updated tracks of process wide tables
+REFRESH_INTERVAL = 10
+
+_TABLE = namedtuple("table", ["updated", "checked", "value"])
+
+# Seconds a Scout case id is kept before its display name is looked up again
+CASE_ID_TIMEOUT = 300
+CASE_ID_CACHE_SIZE = 1000
+
+_case_ids = OrderedDict()
+_case_ids_lock = threading.Lock()
+
+# Fields of Scout variants that are rendered by the variant track
+VARIANT_FIELDS = (
+    "_id",
+    "alternative",
+    "category",
+    "chromosome",
+    "cytoband_end",
+    "cytoband_start",
+    "display_name",
+    "end",
+    "length",
+    "position",
+    "quality",
+    "rank_score",
+    "reference",
+    "sub_category",
+    "variant_id",
+    "variant_type",
+)
+# Scout variant indexes are prefixed with case_id, category and variant_type
+VARIANT_TYPES = ("clinical", "research")
+
+
+def register_data_update(
+    track_type, name=None, content_hash=None, genome_build=None
+):
+    """Register that a track was updated.
+
+    The content hash of the files the track was loaded from is stored to
+    detect if the files have changed. Tracks loaded per genome build have
+    one entry for each build.
+    """
     db = app.config["GENS_DB"][UPDATES]
     LOG.debug(f"Creating timestamp for {track_type}")
     track = {"track": track_type, "name": name}
-    db.delete_many(track)  # remove old track
-    db.insert_one({**track, "timestamp": datetime.datetime.now()})
+    # remove old track, including entries from before builds were stored
+    db.delete_many({**track, "genome_build": {"$in": [genome_build, None]}})
+    db.insert_one(
+        {
+            **track,
+            "genome_build": genome_build,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc),
+            "content_hash": content_hash,
+        }
+    )
+
+
+def get_content_hash(track_type, name=None, genome_build=None):
+    """Get the content hash of the files a track was last loaded from."""
+    db = app.config["GENS_DB"][UPDATES]
+    entry = db.find_one(
+        {"track": track_type, "name": name, "genome_build": genome_build}
+    )
+    return None if entry is None else entry.get("content_hash")
+
+
+def get_latest_update(db, track_type):
+    """Get when a track type was last updated, None if it was never updated."""
+    entry = db[UPDATES].find_one({"track": track_type}, sort=[("timestamp", -1)])
+    return None if entry is None else entry["timestamp"]
+
+
+class UpdatedTables:
+    """Process wide tables that are rebuilt when their track is updated.
+
+    The updates collection is checked at most every refresh_interval seconds
+    for each table.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, db, track_type, key, build):
+        """Get the table of a key, build is called to read it from the database."""
+        key = (db, track_type, key)
+        now = time.monotonic()
+        with self._lock:
+            table = self._tables.get(key)
+        if table is not None and now - table.checked < self.refresh_interval:
+            return table.value
+
+        updated = get_latest_update(db, track_type)
+        if table is None or table.updated != updated:
+            table = _TABLE(updated, now, build())
+        else:
+            table = table._replace(checked=now)
+        with self._lock:
+            self._tables[key] = table
+        return table.value
+
+
+_indexes = UpdatedTables()
 
 
 def get_timestamps(track_type="all"):
@@ -49,23 +157,162 @@ def get_timestamps(track_type="all"):
     return results
 
 
-def query_variants(case_name: str, variant_category: VariantCategory, **kwargs):
+def gene_name_key(gene_name):
+    """Get the normalized gene name used for case insensitive lookups."""
+    return gene_name.lower()
+
+
+def query_gene_region(gene_name, genome_build=None):
+    """Get the chromosome, start and end of all transcripts of a gene.
+
+    Returns None if there is no gene with the name.
+    """
+    match = {"gene_name_key": gene_name_key(gene_name)}
+    if genome_build is not None:
+        match["genome_build"] = int(genome_build)
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"chrom": "$chrom", "genome_build": "$genome_build"},
+                "start": {"$min": "$start"},
+                "end": {"$max": "$end"},
+            }
+        },
+        {"$sort": {"start": 1}},
+        {"$limit": 1},
+    ]
+    result = next(app.config["GENS_DB"][TRANSCRIPTS].aggregate(pipeline), None)
+    if result is None:
+        return None
+    return {**result["_id"], "start": result["start"], "end": result["end"]}
+
+
+def query_gene_names(prefix, genome_build=None, limit=10):
+    """Get names of genes starting with a prefix, ignoring case."""
+    match = {"gene_name_key": {"$regex": "^" + re.escape(gene_name_key(prefix))}}
+    if genome_build is not None:
+        match["genome_build"] = int(genome_build)
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$gene_name_key", "gene_name": {"$first": "$gene_name"}}},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+    ]
+    return [
+        result["gene_name"]
+        for result in app.config["GENS_DB"][TRANSCRIPTS].aggregate(pipeline)
+    ]
+
+
+def add_missing_gene_name_keys(db):
+    """Set the gene name key of transcripts that were loaded without one."""
+    collection = db[TRANSCRIPTS]
+    records = collection.find(
+        {"gene_name_key": {"$exists": False}}, {"gene_name": True}
+    )
+    # update transcripts of the same gene together
+    gene_names = defaultdict(list)
+    for record in records:
+        gene_names[gene_name_key(record["gene_name"])].append(record["_id"])
+    n_updated = 0
+    for key, ids in gene_names.items():
+        result = collection.update_many(
+            {"_id": {"$in": ids}}, {"$set": {"gene_name_key": key}}
+        )
+        n_updated += result.modified_count
+    return n_updated
+
+
+def region_bin(start, end):
+    """Get the smallest bin that contains the closed interval [start, end]."""
+    if not 0 <= start <= end <= BIN_MAX_POS:
+        raise ValueError(f"Can not bin interval {start}-{end}")
+    start_bin = start >> BIN_FIRST_SHIFT
+    end_bin = end >> BIN_FIRST_SHIFT
+    for offset in BIN_OFFSETS:
+        if start_bin == end_bin:
+            return offset + start_bin
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+
+
+def region_bins(start, end):
+    """Get all bins that can contain intervals overlapping [start, end]."""
+    start_bin = max(0, start) >> BIN_FIRST_SHIFT
+    end_bin = min(end, BIN_MAX_POS) >> BIN_FIRST_SHIFT
+    bins = []
+    for offset in BIN_OFFSETS:
+        bins.extend(range(offset + start_bin, offset + end_bin + 1))
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    return bins
+
+
+def add_missing_bins(db, collection_name):
+    """Set the bin of records that were loaded without one."""
+    collection = db[collection_name]
+    records = collection.find({"bin": {"$exists": False}}, {"start": 1, "end": 1})
+    # update records with the same bin together
+    bins = defaultdict(list)
+    for record in records:
+        bins[region_bin(record["start"], record["end"])].append(record["_id"])
+    n_updated = 0
+    for bin_number, ids in bins.items():
+        result = collection.update_many(
+            {"_id": {"$in": ids}}, {"$set": {"bin": bin_number}}
+        )
+        n_updated += result.modified_count
+    return n_updated
+
+
+def get_case_id(case_name: str):
+    """Get the Scout case id of a case from its display name.
+
+    Case ids are cached for CASE_ID_TIMEOUT seconds, names without a case
+    are not cached. At most CASE_ID_CACHE_SIZE case ids are kept.
+    """
+    db = app.config["SCOUT_DB"]
+    key = (db, case_name)
+    now = time.monotonic()
+    with _case_ids_lock:
+        cached = _case_ids.get(key)
+    if cached is not None and now < cached[1]:
+        return cached[0]
+
+    response = db.case.find_one({"display_name": case_name}, {"_id": True})
+    if response is None:
+        raise ValueError(f"No case with name: {case_name}")
+    with _case_ids_lock:
+        _case_ids[key] = (response["_id"], now + CASE_ID_TIMEOUT)
+        _case_ids.move_to_end(key)
+        # drop expired case ids and the oldest ones if the cache is full
+        expired = [name for name, (_, expires) in _case_ids.items() if expires <= now]
+        for name in expired:
+            del _case_ids[name]
+        while len(_case_ids) > CASE_ID_CACHE_SIZE:
+            _case_ids.popitem(last=False)
+    return response["_id"]
+
+
+def query_variants(
+    case_name: str, variant_category: VariantCategory, limit=0, **kwargs
+):
     """Search the scout database for variants associated with a case.
 
     case_id :: name for a case (not database uid)
     varaint_category :: categories
+    limit :: maximum number of variants, highest rank score first, 0 for all
 
     Kwargs are optional search parameters that are passed to db.find().
+    Only the fields in VARIANT_FIELDS are returned.
     """
-    # lookup case_id from the displayed name
     db = app.config["SCOUT_DB"]
-    response = db.case.find_one({"display_name": case_name})
-    if response is None:
-        raise ValueError(f"No case with name: {case_name}")
     # build query
     query = {
-        "case_id": response["_id"],
+        "case_id": get_case_id(case_name),
         "category": variant_category.value,
+        "variant_type": {"$in": list(VARIANT_TYPES)},
     }
     # add chromosome
     if "chromosome" in kwargs:
@@ -80,7 +327,12 @@ def query_variants(case_name: str, variant_category: VariantCategory, **kwargs):
         }
     # query database
     LOG.info(f"Query variant database: {query}")
-    return db.variant.find(query)
+    return db.variant.find(
+        query,
+        {field: True for field in VARIANT_FIELDS},
+        sort=[("rank_score", -1)],
+        limit=limit,
+    )
 
 
 def _make_query_region(start_pos: int, end_pos: int, motif_type="other"):
@@ -99,6 +351,35 @@ def _make_query_region(start_pos: int, end_pos: int, motif_type="other"):
     }
 
 
+def _make_query_bins(start_pos: int, end_pos: int):
+    """Make a query for records overlapping a region using their bins."""
+    return {
+        "bin": {"$in": region_bins(start_pos, end_pos)},
+        "start": {"$lte": end_pos},
+        "end": {"$gte": start_pos},
+    }
+
+
+def _get_interval_index(record_type, chrom, genome_build, **kwargs):
+    """Get an in-memory interval index of the records of a chromosome.
+
+    Indexes are built on first access and rebuilt when the updates
+    collection shows that the track has been updated.
+    """
+    db = app.config["GENS_DB"]
+
+    def build_index():
+        LOG.info(f"Building interval index of {record_type} on chromosome {chrom}")
+        records = db[record_type].find(
+            {"chrom": chrom, "genome_build": genome_build, **kwargs},
+            {"_id": False, "bin": False},
+        )
+        return IntervalIndex(records)
+
+    key = (chrom, genome_build, tuple(sorted(kwargs.items())))
+    return _indexes.get(db, record_type, key, build_index)
+
+
 def query_records_in_region(
     record_type,
     chrom,
@@ -106,14 +387,29 @@ def query_records_in_region(
     end_pos,
     genome_build,
     height_order=None,
+    exclude_fields=(),
     **kwargs,
 ):
-    """Query the gens database for transcript information."""
+    """Query the gens database for annotations or transcripts in a region.
+
+    Records are read from in-memory interval indexes if ANNOTATION_INDEX is
+    set in the configuration. Fields in exclude_fields are left out of the
+    records.
+    """
+    if app.config.get("ANNOTATION_INDEX", False):
+        intervals = _get_interval_index(record_type, chrom, genome_build, **kwargs)
+        records = intervals.query(start_pos, end_pos, height_order)
+        if exclude_fields:
+            records = [
+                {key: val for key, val in rec.items() if key not in exclude_fields}
+                for rec in records
+            ]
+        return records
     # build base query
     query = {
         "chrom": chrom,
         "genome_build": genome_build,
-        **_make_query_region(start_pos, end_pos),
+        **_make_query_bins(start_pos, end_pos),
         **kwargs,  # add optional search params
     }
     # build sort order
@@ -123,6 +419,62 @@ def query_records_in_region(
     else:
         query["height_order"] = height_order
     # query database
+    projection = {"_id": False, "bin": False}
+    projection.update({field: False for field in exclude_fields})
     return app.config["GENS_DB"][record_type].find(
-        query, {"_id": False}, sort=sort_order
+        query, projection, sort=sort_order
+    )
+
+
+def _region_bin_expr(field, start_pos, end_pos, n_bins):
+    """Get an aggregation expression of the bin a position is in."""
+    span = max(1, end_pos - start_pos + 1)
+    offset = {"$subtract": [field, start_pos]}
+    return {"$floor": {"$divide": [{"$multiply": [offset, n_bins]}, span]}}
+
+
+def query_region_density(
+    record_type, chrom, start_pos, end_pos, genome_build, n_bins, **kwargs
+):
+    """Count annotations or transcripts overlapping each bin of a region.
+
+    Without in-memory indexes the records are counted by the database, which
+    only returns the number of records starting and ending in each bin.
+    """
+    if app.config.get("ANNOTATION_INDEX", False):
+        intervals = _get_interval_index(record_type, chrom, genome_build, **kwargs)
+        return interval_density(
+            intervals.starts, intervals.ends, start_pos, end_pos, n_bins
+        )
+    query = {
+        "chrom": chrom,
+        "genome_build": genome_build,
+        **_make_query_bins(start_pos, end_pos),
+        **kwargs,  # add optional search params
+    }
+    pipeline = [
+        {"$match": query},
+        {
+            "$project": {
+                "_id": False,
+                "first": _region_bin_expr(
+                    {"$max": ["$start", start_pos]}, start_pos, end_pos, n_bins
+                ),
+                "last": _region_bin_expr(
+                    {"$min": ["$end", end_pos]}, start_pos, end_pos, n_bins
+                ),
+            }
+        },
+        {
+            "$facet": {
+                field: [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+                for field in ["first", "last"]
+            }
+        },
+    ]
+    result = next(app.config["GENS_DB"][record_type].aggregate(pipeline))
+    first_counts, last_counts = (
+        {int(group["_id"]): group["count"] for group in result[field]}
+        for field in ["first", "last"]
     )
+    return density_from_counts(first_counts, last_counts, n_bins)
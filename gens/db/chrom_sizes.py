@@ -1,20 +1,42 @@
 """Read and write chrom sizes."""
 
+from types import MappingProxyType
+
+from .annotation import UpdatedTables
+
 CHROMSIZES = "chrom-sizes"
 
+_tables = UpdatedTables()
+
+
+def get_chromosome_sizes(db, genome_build=38):
+    """
+    Gets a read only table of chromosome data of a genome build
+
+    The table is shared within the process and read again from the database
+    when the updates collection shows that the chromosome sizes are updated.
+    """
+
+    def build_table():
+        chroms = {
+            chrom_data["chrom"]: chrom_data
+            for chrom_data in db[CHROMSIZES].find(
+                {"genome_build": int(genome_build)}, {"_id": False}
+            )
+        }
+        return MappingProxyType(chroms)
+
+    return _tables.get(db, CHROMSIZES, int(genome_build), build_table)
+
 
 def get_chromosome_size(db, chrom, genome_build=38):
     """
     Gets the size in base pairs of a chromosome
     """
-    chrom_data = db[CHROMSIZES].find_one(
-        {
-            "chrom": str(chrom),
-            "genome_build": int(genome_build),
-        }
-    )
+    chrom_data = get_chromosome_sizes(db, genome_build).get(str(chrom))
     if chrom_data is None:
         raise ValueError(
             f"Could not find data for chromosome {chrom} in DB; genome_build: {genome_build}"
         )
-    return chrom_data
+    # copy to protect the shared table
+    return dict(chrom_data)
@@ -16,6 +16,17 @@ INDEXES = {
             name="genome_position",
             background=True,
         ),
+        IndexModel(
+            [
+                ("chrom", ASCENDING),
+                ("genome_build", ASCENDING),
+                ("source", ASCENDING),
+                ("bin", ASCENDING),
+                ("start", ASCENDING),
+            ],
+            name="genome_bin",
+            background=True,
+        ),
         IndexModel(
             [("chrom", ASCENDING), ("source", ASCENDING)],
             name="chrom_source",
@@ -43,6 +54,21 @@ INDEXES = {
             name="genome_position",
             background=True,
         ),
+        IndexModel(
+            [
+                ("chrom", ASCENDING),
+                ("genome_build", ASCENDING),
+                ("bin", ASCENDING),
+                ("start", ASCENDING),
+            ],
+            name="genome_bin",
+            background=True,
+        ),
+        IndexModel(
+            [("gene_name_key", ASCENDING), ("genome_build", ASCENDING)],
+            name="gene_name_key_genome_build",
+            background=True,
+        ),
         IndexModel(
             [("height_order", ASCENDING)],
             name="height_order",
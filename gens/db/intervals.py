@@ -0,0 +1,67 @@
+"""In-memory interval index of annotation and transcript records."""
+import numpy as np
+
+
+class IntervalIndex:
+    """Records of a chromosome sorted on start with the running max of ends.
+
+    Records overlapping a region are found with binary searches on the
+    start positions and the running maximum of end positions.
+    """
+
+    def __init__(self, records):
+        self.records = sorted(
+            records, key=lambda rec: (rec["start"], rec.get("height_order") or 0)
+        )
+        self.starts = np.array([rec["start"] for rec in self.records], dtype=np.int64)
+        self.ends = np.array([rec["end"] for rec in self.records], dtype=np.int64)
+        self.max_ends = np.maximum.accumulate(self.ends) if self.records else self.ends
+
+    def __len__(self):
+        return len(self.records)
+
+    def query(self, start_pos, end_pos, height_order=None):
+        """Get records overlapping the closed interval [start_pos, end_pos]."""
+        # records before first are ending before the region and records
+        # from last are starting after it
+        first = np.searchsorted(self.max_ends, start_pos, side="left")
+        last = np.searchsorted(self.starts, end_pos, side="right")
+        if first >= last:
+            return []
+        overlapping = np.flatnonzero(self.ends[first:last] >= start_pos) + first
+        records = [self.records[idx] for idx in overlapping]
+        if height_order is not None:
+            records = [rec for rec in records if rec["height_order"] == height_order]
+        return records
+
+
+def interval_density(starts, ends, start_pos, end_pos, n_bins):
+    """Count intervals overlapping each of n_bins equally sized bins of a region."""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    overlapping = (starts <= end_pos) & (ends >= start_pos)
+    starts = np.maximum(starts[overlapping], start_pos)
+    ends = np.minimum(ends[overlapping], end_pos)
+    # first and last bin of each interval
+    span = max(1, end_pos - start_pos + 1)
+    first = (starts - start_pos) * n_bins // span
+    last = (ends - start_pos) * n_bins // span
+    # sum the number of intervals starting and ending before each bin
+    changes = np.bincount(first, minlength=n_bins + 1) - np.bincount(
+        last + 1, minlength=n_bins + 1
+    )
+    return np.cumsum(changes[:n_bins])
+
+
+def density_from_counts(first_counts, last_counts, n_bins):
+    """Count intervals overlapping each bin from the counts of their end bins.
+
+    first_counts and last_counts map bins to the number of intervals that
+    start and end in them.
+    """
+    changes = np.zeros(n_bins + 1, dtype=np.int64)
+    for bin_idx, count in first_counts.items():
+        changes[bin_idx] += count
+    for bin_idx, count in last_counts.items():
+        changes[bin_idx + 1] -= count
+    return np.cumsum(changes[:n_bins])
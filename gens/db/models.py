@@ -1,11 +1,12 @@
 """Data models returned when fetching information from SCOUT and GENS database interactions."""
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 
 import attr
 
-from gens.constants import GENOME_BUILDS
+from gens.constants import (COVERAGE_BACKENDS, GENOME_BUILDS,
+                            RESOLUTION_BIN_SIZES)
 
 
 class VariantCategory(Enum):
@@ -30,3 +31,9 @@ class SampleObj:
     )
     created_at: datetime = attr.ib()
     overview_file: Optional[str] = attr.ib(default=None)
+    backend: str = attr.ib(
+        default="tabix", validator=attr.validators.in_(COVERAGE_BACKENDS)
+    )
+    bin_sizes: Dict[str, int] = attr.ib(
+        factory=lambda: dict(RESOLUTION_BIN_SIZES), converter=dict, hash=False
+    )
@@ -6,6 +6,8 @@ import logging
 
 from pymongo import DESCENDING
 
+from gens.constants import RESOLUTION_BIN_SIZES
+
 from .models import SampleObj
 
 LOG = logging.getLogger(__name__)
@@ -20,7 +22,16 @@ class SampleNotFoundError(Exception):
         self.sample_id = sample_id
 
 
-def store_sample(db, sample_id, genome_build, baf, coverage, overview):
+def store_sample(
+    db,
+    sample_id,
+    genome_build,
+    baf,
+    coverage,
+    overview,
+    backend="tabix",
+    bin_sizes=None,
+):
     """Store a new sample in the database."""
     LOG.info(f'Store sample "{sample_id}" in database')
     db[COLLECTION].insert_one(
@@ -29,12 +40,28 @@ def store_sample(db, sample_id, genome_build, baf, coverage, overview):
             "baf_file": baf,
             "coverage_file": coverage,
             "overview_file": overview,
+            "backend": backend,
+            "bin_sizes": bin_sizes or RESOLUTION_BIN_SIZES,
             "genome_build": genome_build,
-            "created_at": datetime.datetime.now(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
         }
     )
 
 
+def _build_sample_obj(result):
+    """Build a sample object from a sample document."""
+    return SampleObj(
+        sample_id=result["sample_id"],
+        genome_build=result["genome_build"],
+        baf_file=result["baf_file"],
+        coverage_file=result["coverage_file"],
+        overview_file=result["overview_file"],
+        backend=result.get("backend", "tabix"),
+        bin_sizes=result.get("bin_sizes", RESOLUTION_BIN_SIZES),
+        created_at=result["created_at"],
+    )
+
+
 def get_samples(db, start=0, n_samples=None):
     """
     Get samples stored in the databse.
@@ -42,14 +69,7 @@ def get_samples(db, start=0, n_samples=None):
     use n_samples to limit the results to x most recent samples
     """
     results = (
-        SampleObj(
-            sample_id=r["sample_id"],
-            genome_build=r["genome_build"],
-            baf_file=r["baf_file"],
-            coverage_file=r["coverage_file"],
-            overview_file=r["overview_file"],
-            created_at=r["created_at"],
-        )
+        _build_sample_obj(r)
         for r in db[COLLECTION].find().sort("created_at", DESCENDING)
     )
     # limit results to n results
@@ -58,6 +78,12 @@ def get_samples(db, start=0, n_samples=None):
     return results, db[COLLECTION].count_documents({})
 
 
+def get_samples_without_overview(db):
+    """Get samples that have no overview file."""
+    query = {"overview_file": None}
+    return [_build_sample_obj(r) for r in db[COLLECTION].find(query)]
+
+
 def query_sample(db, sample_id, genome_build):
     """Get a sample with id."""
     result = db[COLLECTION].find_one({"sample_id": sample_id})
@@ -66,11 +92,16 @@ def query_sample(db, sample_id, genome_build):
         raise SampleNotFoundError(
             f'No sample with id: "{sample_id}" in database', sample_id
         )
-    return SampleObj(
-        sample_id=result["sample_id"],
-        genome_build=result["genome_build"],
-        baf_file=result["baf_file"],
-        coverage_file=result["coverage_file"],
-        overview_file=result["overview_file"],
-        created_at=result["created_at"],
+    return _build_sample_obj(result)
+
+
+def update_sample_overview(db, sample_id, genome_build, overview):
+    """Set the overview file of a sample."""
+    LOG.info(f'Set overview file of sample "{sample_id}" to {overview}')
+    db[COLLECTION].update_one(
+        {
+            "sample_id": sample_id,
+            "genome_build": {"$in": [str(genome_build), int(genome_build)]},
+        },
+        {"$set": {"overview_file": overview}},
     )
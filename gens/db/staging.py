@@ -0,0 +1,97 @@
+"""Reload collections through staging collections that replace them."""
+import datetime
+import logging
+import time
+from contextlib import contextmanager
+
+from pymongo.errors import DuplicateKeyError
+
+from .index import INDEXES
+
+LOG = logging.getLogger(__name__)
+
+LOCKS = "locks"
+# Seconds to wait for another load of a collection to finish
+LOCK_TIMEOUT = 3600
+LOCK_POLL_INTERVAL = 5
+
+
+def _staging_name(collection_name):
+    return f"{collection_name}_staging"
+
+
+@contextmanager
+def collection_lock(db, collection_name, timeout=LOCK_TIMEOUT):
+    """Lock a collection while it is reloaded.
+
+    Waits for loads by other processes to finish, as their staging
+    collection would otherwise be overwritten.
+    """
+    waited_since = time.monotonic()
+    while True:
+        try:
+            db[LOCKS].insert_one(
+                {
+                    "_id": collection_name,
+                    "created_at": datetime.datetime.now(datetime.timezone.utc),
+                }
+            )
+            break
+        except DuplicateKeyError:
+            if time.monotonic() - waited_since >= timeout:
+                lock = db[LOCKS].find_one({"_id": collection_name}) or {}
+                raise TimeoutError(
+                    f"{collection_name} is locked by a load started at "
+                    f"{lock.get('created_at')}, remove the lock from the {LOCKS} "
+                    "collection if that load is no longer running"
+                )
+            LOG.info(f"Waiting for another load of {collection_name} to finish")
+            time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        db[LOCKS].delete_one({"_id": collection_name})
+
+
+def create_staging_collection(db, collection_name, keep=None):
+    """Create a staging collection with the records of a collection to keep.
+
+    Records are loaded into the staging collection while the collection
+    is still in use. keep is a query of the records that are copied from
+    the collection, no records are copied if it is None.
+    """
+    staging_name = _staging_name(collection_name)
+    # remove leftovers from a failed load
+    db.drop_collection(staging_name)
+    if keep is not None:
+        LOG.info(f"Copying records of {collection_name} to {staging_name}")
+        db[collection_name].aggregate([{"$match": keep}, {"$out": staging_name}])
+    return db[staging_name]
+
+
+def replace_with_staging(db, collection_name):
+    """Index the staging collection and rename it to replace the collection."""
+    staging = db[_staging_name(collection_name)]
+    indexes = INDEXES[collection_name]
+    names = ", ".join([i.document.get("name") for i in indexes])
+    LOG.info(f"Creating indexes {names} for collection: {staging.name}")
+    staging.create_indexes(indexes)
+    LOG.info(f"Replacing {collection_name} with {staging.name}")
+    staging.rename(collection_name, dropTarget=True)
+
+
+@contextmanager
+def staging_collection(db, collection_name, keep=None):
+    """Reload a collection through a staging collection.
+
+    The collection is locked while the staging collection is loaded and it
+    is replaced by the staging collection if no error was raised.
+    """
+    with collection_lock(db, collection_name):
+        staging = create_staging_collection(db, collection_name, keep)
+        try:
+            yield staging
+        except BaseException:
+            db.drop_collection(staging.name)
+            raise
+        replace_with_staging(db, collection_name)
@@ -1,17 +1,18 @@
 """Functions for getting information from Gens views."""
-import itertools
 import logging
-import re
 from collections import namedtuple
 
+import numpy as np
+
 from flask import current_app as app
 from flask import request
 
 from .cache import cache
-from .constants import CHROMOSOMES
-from .db import get_chromosome_size
+from .constants import CHROMOSOMES, RESOLUTION_BIN_SIZES
+from .db import get_chromosome_size, query_gene_region
 from .exceptions import NoRecordsException, RegionParserException
-from .io import tabix_query
+from .io import tile_query
+from .store import CoverageStore, store_query
 
 LOG = logging.getLogger(__name__)
 
@@ -33,51 +34,100 @@ REQUEST = namedtuple(
         "log2_y_end",
         "genome_build",
         "reduce_data",
+        "reduce_method",
     ),
+    defaults=("fraction",),
 )
 
 
-@cache.memoize(0)
-def convert_data(
-    graph, req, log2_list, baf_list, x_pos, new_start_pos, new_x_ampl, data_type="bed"
+def _to_screen_coordinates(
+    positions, values, y_start, y_end, ypos, ampl, x_pos, new_start_pos, new_x_ampl
 ):
+    """Cap values to the graph limits and convert them to screen coordinates.
+
+    Returns a flat array of alternating x and y coordinates.
     """
-    Converts data for Log2 ratio and BAF to screen coordinates
-    Also caps the data
+    # Cap values to end points
+    values = np.where(values > y_start, y_start + 0.2, values)
+    values = np.where(values < y_end, y_end - 0.2, values)
+
+    # Convert to screen coordinates, casting truncates towards zero like int()
+    coords = np.empty(2 * len(positions), dtype=np.int64)
+    coords[0::2] = x_pos + new_x_ampl * (positions - new_start_pos)
+    coords[1::2] = ypos - ampl * values
+    return coords
+
+
+def _envelope(coords):
+    """Reduce screen coordinates to the min, max and mean y value per x pixel.
+
+    Outliers are preserved while at most three points are kept for every
+    pixel column.
     """
+    if len(coords) == 0:
+        return coords
+    x_coords, y_coords = coords[0::2], coords[1::2]
+    order = np.argsort(x_coords, kind="stable")
+    x_coords, y_coords = x_coords[order], y_coords[order]
+
+    # find the first point in each pixel column
+    col_starts = np.flatnonzero(np.diff(x_coords, prepend=x_coords[0] - 1))
+    col_sizes = np.diff(np.append(col_starts, len(x_coords)))
+    y_min = np.minimum.reduceat(y_coords, col_starts)
+    y_max = np.maximum.reduceat(y_coords, col_starts)
+    y_mean = (np.add.reduceat(y_coords, col_starts) / col_sizes).astype(np.int64)
+
+    # skip points that are drawn at the same pixel
+    col_y = np.column_stack([y_min, y_mean, y_max])
+    keep = np.column_stack(
+        [
+            np.ones(len(col_starts), dtype=bool),
+            (col_sizes > 2) & (y_mean != y_min) & (y_mean != y_max),
+            y_max != y_min,
+        ]
+    )
+    col_x = np.repeat(x_coords[col_starts], 3).reshape(-1, 3)
+    envelope = np.empty(2 * keep.sum(), dtype=np.int64)
+    envelope[0::2] = col_x[keep]
+    envelope[1::2] = col_y[keep]
+    return envelope
 
-    if data_type == "json":
-        CHRPOS_IDX, VALUE_IDX = 0, 1
-    elif data_type == "bed":
-        CHRPOS_IDX, VALUE_IDX = 1, 3
-    else:
-        raise ValueError(f"Data type {bed_type} not supported. Use bed or json!")
 
+def convert_arrays(graph, req, log2_data, baf_data, x_pos, new_start_pos, new_x_ampl):
+    """
+    Converts position and value arrays for Log2 ratio and BAF to screen
+    coordinates. Also caps the data
+    """
     #  Normalize and calculate the Lo2 ratio
-    log2_records = []
-    for record in log2_list:
-        # Cap values to end points
-        ypos = float(record[VALUE_IDX])
-        ypos = req.log2_y_start + 0.2 if ypos > req.log2_y_start else ypos
-        ypos = req.log2_y_end - 0.2 if ypos < req.log2_y_end else ypos
-
-        # Convert to screen coordinates
-        xpos = (int(x_pos + new_x_ampl * (float(record[CHRPOS_IDX]) - new_start_pos)),)
-        log2_records.extend([xpos, int(graph.log2_ypos - graph.log2_ampl * ypos)])
+    log2_records = _to_screen_coordinates(
+        *log2_data,
+        req.log2_y_start,
+        req.log2_y_end,
+        graph.log2_ypos,
+        graph.log2_ampl,
+        x_pos,
+        new_start_pos,
+        new_x_ampl,
+    )
 
     # Gather the BAF records
-    baf_records = []
-    for record in baf_list:
-        # Cap values to end points
-        ypos = float(record[VALUE_IDX])
-        ypos = req.baf_y_start + 0.2 if ypos > req.baf_y_start else ypos
-        ypos = req.baf_y_end - 0.2 if ypos < req.baf_y_end else ypos
+    baf_records = _to_screen_coordinates(
+        *baf_data,
+        req.baf_y_start,
+        req.baf_y_end,
+        graph.baf_ypos,
+        graph.baf_ampl,
+        x_pos,
+        new_start_pos,
+        new_x_ampl,
+    )
 
-        # Convert to screen coordinates
-        xpos = (int(x_pos + new_x_ampl * (float(record[CHRPOS_IDX]) - new_start_pos)),)
-        baf_records.extend([xpos, int(graph.baf_ypos - graph.baf_ampl * ypos)])
+    # Downsample to the data points that are visible at the plot width
+    if req.reduce_method == "envelope":
+        log2_records = _envelope(log2_records)
+        baf_records = _envelope(baf_records)
 
-    return log2_records, baf_records
+    return log2_records.tolist(), baf_records.tolist()
 
 
 def find_chrom_at_pos(chrom_dims, height, current_x, current_y, margin):
@@ -118,10 +168,28 @@ def overview_chrom_dimensions(x_pos, y_pos, plot_width, genome_build):
     return chrom_dims
 
 
+def select_resolution(size, x_ampl, bin_sizes=None):
+    """Get the coarsest resolution with at least one data point per pixel.
+
+    The overview resolution is not used for interactive graphs.
+    """
+    bin_sizes = bin_sizes or RESOLUTION_BIN_SIZES
+    resolutions = sorted(
+        (res for res in bin_sizes if res != "o"), key=bin_sizes.get, reverse=True
+    )
+    for res in resolutions:
+        if size / bin_sizes[res] >= x_ampl:
+            return res
+    return resolutions[-1]
+
+
 @cache.memoize(50)
-def parse_region_str(region, genome_build):
+def parse_region_str(region, genome_build, x_ampl=None, bin_sizes=None):
     """
     Parses a region string
+
+    The resolution is selected from the plot width in pixels, x_ampl, and the
+    bin sizes of the resolutions if the plot width is known.
     """
     name_search = None
     try:
@@ -147,27 +215,11 @@ def parse_region_str(region, genome_build):
             chrom = name_search.upper()
         else:
             # Lookup queried gene
-            collection = app.config["GENS_DB"]["transcripts" + genome_build]
-            start = collection.find_one(
-                {
-                    "gene_name": re.compile(
-                        "^" + re.escape(name_search) + "$", re.IGNORECASE
-                    )
-                },
-                sort=[("start", 1)],
-            )
-            end = collection.find_one(
-                {
-                    "gene_name": re.compile(
-                        "^" + re.escape(name_search) + "$", re.IGNORECASE
-                    )
-                },
-                sort=[("end", -1)],
-            )
-            if start is not None and end is not None:
-                chrom = start["chrom"]
-                start = start["start"]
-                end = end["end"]
+            gene_region = query_gene_region(name_search, genome_build)
+            if gene_region is not None:
+                chrom = gene_region["chrom"]
+                start = gene_region["start"]
+                end = gene_region["end"]
             else:
                 LOG.warning("Did not find range for gene name")
                 return None
@@ -191,6 +243,9 @@ def parse_region_str(region, genome_build):
         start = max(0, start - (end - chrom_data["size"]))
         end = chrom_data["size"]
 
+    if x_ampl is not None:
+        return select_resolution(size, x_ampl, bin_sizes), chrom, start, end
+
     resolution = "d"
     if size > 15000000:
         resolution = "a"
@@ -247,12 +302,12 @@ def set_region_values(parsed_region, x_ampl):
     )
 
 
-def get_cov(req, x_ampl, json_data=None, cov_fh=None, baf_fh=None):
+def get_cov(req, x_ampl, json_data=None, cov_fh=None, baf_fh=None, bin_sizes=None):
     """Get Log2 ratio and BAF values for chromosome with screen coordinates."""
     db = app.config["GENS_DB"]
     graph = set_graph_values(req)
     # parse region
-    parsed_region = parse_region_str(req.region, req.genome_build)
+    parsed_region = parse_region_str(req.region, req.genome_build, x_ampl, bin_sizes)
     if not parsed_region:
         raise RegionParserException("No parsed region")
 
@@ -266,38 +321,41 @@ def get_cov(req, x_ampl, json_data=None, cov_fh=None, baf_fh=None):
     ) = set_region_values(parsed_region, x_ampl)
 
     if json_data:
-        data_type = "json"
+        # overview data is read as arrays of positions and values
         baf_list = json_data[region.chrom]["baf"]
         log2_list = json_data[region.chrom]["cov"]
     else:
-        data_type = "bed"
-
         # Bound start and end balues to 0-chrom_size
         end = min(
             new_end_pos, get_chromosome_size(db, region.chrom, req.genome_build)["size"]
         )
         start = max(new_start_pos, 0)
 
-        # Load BAF and Log2 data from tabix files
-        log2_list = tabix_query(
+        # envelope downsampling is done after conversion to screen coordinates
+        reduce = req.reduce_data if req.reduce_method == "fraction" else None
+        # tabix files are read through the tile cache
+        query = store_query if isinstance(cov_fh, CoverageStore) else tile_query
+
+        # Load BAF and Log2 data from tabix files or coverage stores
+        log2_list = query(
             cov_fh,
             region.res,
             region.chrom,
             start,
             end,
-            req.reduce_data,
+            reduce,
         )
-        baf_list = tabix_query(
+        baf_list = query(
             baf_fh,
             region.res,
             region.chrom,
             start,
             end,
-            req.reduce_data,
+            reduce,
         )
 
     # Convert the data to screen coordinates
-    log2_records, baf_records = convert_data(
+    log2_records, baf_records = convert_arrays(
         graph,
         req,
         log2_list,
@@ -305,7 +363,6 @@ def get_cov(req, x_ampl, json_data=None, cov_fh=None, baf_fh=None):
         req.x_pos - extra_plot_width,
         new_start_pos,
         new_x_ampl,
-        data_type=data_type,
     )
     if not new_start_pos and not log2_records and not baf_records:
         LOG.warning("No records for region")
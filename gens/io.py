@@ -1,17 +1,26 @@
 """Functions for loading and converting data."""
-import itertools
+import gzip
+import json
 import logging
 import os
+import struct
+import threading
+from collections import OrderedDict
 from fractions import Fraction
 
+import numpy as np
 import pysam
 from flask import Response, abort, request
 
-from .cache import cache
+from .cache import MemoryCache, cache
+from .constants import RESOLUTION_BIN_SIZES
 
 BAF_SUFFIX = ".baf.bed.gz"
 COV_SUFFIX = ".cov.bed.gz"
 JSON_SUFFIX = ".overview.json.gz"
+BINARY_MIMETYPE = "application/octet-stream"
+NDJSON_MIMETYPE = "application/x-ndjson"
+BINARY_HEADER = struct.Struct("<I")
 
 
 LOG = logging.getLogger(__name__)
@@ -27,30 +36,218 @@ def _get_filepath(*args, check=True):
     return path
 
 
+def _tabix_version(path):
+    """Get values that change when a tabix file or its index is replaced."""
+    return tuple(
+        (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        for stat in (os.stat(path), os.stat(path + ".tbi"))
+    )
+
+
+class TabixPool:
+    """Thread safe size bounded LRU pool of open tabix files.
+
+    The pool is shared by the threads of the process. A TabixFile can not be
+    used by two threads at once, so each handle is owned by a thread and is
+    handed over to another thread when its owner has finished, such as the
+    thread of a previous request. Handles are reopened if the file or its
+    index has been replaced.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        # handles keyed on path and owner thread in least recently used order
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure pool size from the app configuration."""
+        # a sample needs both the coverage and baf file to be open
+        self.maxsize = max(2, app.config.get("TABIX_POOL_SIZE", self.maxsize))
+
+    def _adopt(self, path, owner):
+        """Hand over a handle of path from a finished thread to owner."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for key in self._handles:
+            if key[0] == path and key[1] not in alive:
+                self._handles[(path, owner)] = self._handles.pop(key)
+                return
+
+    def _evict(self, owner):
+        """Close least recently used handles that are not in use."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        n_handles = len(self._handles)
+        # the most recently used handle was just opened by owner
+        for key in list(self._handles)[:-1]:
+            if n_handles <= self.maxsize:
+                break
+            # handles of other running threads might be in use
+            if key[1] == owner or key[1] not in alive:
+                _, evicted = self._handles.pop(key)
+                evicted.close()
+                n_handles -= 1
+
+    def get(self, path):
+        """Get an open tabix file for path."""
+        version = _tabix_version(path)
+        owner = threading.current_thread().ident
+        key = (path, owner)
+        with self._lock:
+            if key not in self._handles:
+                self._adopt(path, owner)
+            if key in self._handles:
+                open_version, tbix = self._handles[key]
+                if open_version == version:
+                    self._handles.move_to_end(key)
+                    return tbix
+                LOG.info(f"Reopening replaced tabix file: {path}")
+                del self._handles[key]
+                tbix.close()
+
+            self._handles[key] = (version, pysam.TabixFile(path))
+            self._evict(owner)
+            return self._handles[key][1]
+
+    def clear(self):
+        """Close all open handles."""
+        with self._lock:
+            while self._handles:
+                _, (_, tbix) = self._handles.popitem()
+                tbix.close()
+
+
+tabix_pool = TabixPool()
+
+
 def get_tabix_files(coverage_file, baf_file):
     """Get tabix files for sample."""
     _get_filepath(coverage_file + ".tbi") and _get_filepath(baf_file + ".tbi")
-    cov_file = pysam.TabixFile(_get_filepath(coverage_file))
-    baf_file = pysam.TabixFile(_get_filepath(baf_file))
+    cov_file = tabix_pool.get(_get_filepath(coverage_file))
+    baf_file = tabix_pool.get(_get_filepath(baf_file))
     return cov_file, baf_file
 
 
-def tabix_query(tbix, res, chrom, start=None, end=None, reduce=None):
-    """
-    Call tabix and generate an array of strings for each line it returns.
-    """
+def reduce_pattern(reduce):
+    """Get the on/off pattern used for keeping a fraction of the records."""
+    n_true, tot = Fraction(reduce).limit_denominator(1000).as_integer_ratio()
+    return [1] * n_true + [0] * (tot - n_true)
+
+
+def reduce_arrays(positions, values, reduce=None):
+    """Keep a fraction of the data points in arrays of positions and values."""
+    if reduce is None:
+        return positions, values
+    cmap = np.resize(np.array(reduce_pattern(reduce), dtype=bool), len(positions))
+    return positions[cmap], values[cmap]
+
 
-    # Get data from bed file
-    record_name = f"{res}_{chrom}"
-    LOG.info(f"Query {tbix.filename}; {record_name} {start} {end}; reduce: {reduce}")
+tile_cache = MemoryCache("TILE_CACHE_SIZE", max_bytes=512 * 1024**2)
+# Number of data points per resolution that are stored in a tile
+TILE_N_BINS = 2000
+
+
+def _read_tile(tbix, res, chrom, tile_idx):
+    """Read positions and values of a tile from a tabix file."""
+    tile_size = TILE_N_BINS * RESOLUTION_BIN_SIZES[res]
+    start = tile_idx * tile_size
     try:
-        records = tbix.fetch(record_name, start, end)
+        records = tbix.fetch(f"{res}_{chrom}", start, start + tile_size)
     except ValueError as err:
         LOG.error(err)
         records = []
+    rows = [r.split("\t") for r in records]
+    if len(rows) == 0:
+        return np.empty(0), np.empty(0)
+    data = np.array(rows)
+    positions = data[:, 1].astype(np.float64)
+    values = data[:, 3].astype(np.float64)
+    # records overlapping the start belongs to the previous tile
+    in_tile = positions >= start
+    return positions[in_tile], values[in_tile]
+
+
+def tile_query(tbix, res, chrom, start, end, reduce=None):
+    """Get arrays of positions and values in a region from cached tiles.
+
+    Tabix files are read in fixed width genomic tiles that are cached and
+    reused by overlapping queries.
+    """
+    path = tbix.filename.decode()
+    LOG.info(f"Query tiles {path}; {res}_{chrom} {start} {end}; reduce: {reduce}")
+    version = _tabix_version(path)
+    tile_size = TILE_N_BINS * RESOLUTION_BIN_SIZES[res]
+    tiles = []
+    for tile_idx in range(start // tile_size, max(start, end - 1) // tile_size + 1):
+        key = (path, version, res, chrom, tile_idx)
+        tile = tile_cache.get(key)
+        if tile is None:
+            tile = _read_tile(tbix, res, chrom, tile_idx)
+            tile_cache.set(key, tile, sum(arr.nbytes for arr in tile))
+        tiles.append(tile)
+    positions = np.concatenate([tile[0] for tile in tiles])
+    values = np.concatenate([tile[1] for tile in tiles])
+
+    # select positions within [start, end)
+    first, last = np.searchsorted(positions, [start, end], "left")
+    return reduce_arrays(positions[first:last], values[first:last], reduce)
+
+
+overview_cache = MemoryCache("OVERVIEW_CACHE_SIZE", max_bytes=256 * 1024**2)
+
+
+def read_overview_file(path):
+    """Read preprocessed overview data as arrays of positions and values.
+
+    Parsed files are cached in memory and read again if the file is changed.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached_version, data = overview_cache.get(path, (None, None))
+    if cached_version == version:
+        return data
+
+    LOG.info(f"Reading overview file: {path}")
+    with gzip.open(path, "r") as json_gz:
+        json_data = json.loads(json_gz.read().decode("utf-8"))
+    data, n_bytes = {}, 0
+    for chrom, tracks in json_data.items():
+        data[chrom] = {}
+        for track, records in tracks.items():
+            records = np.array(records, dtype=np.float64).reshape(-1, 2)
+            data[chrom][track] = (records[:, 0], records[:, 1])
+            n_bytes += records.nbytes
+    overview_cache.set(path, (version, data), n_bytes)
+    return data
+
+
+def encode_binary(obj, array_keys=("data", "baf")):
+    """Encode coverage as a json header followed by little-endian int32 arrays.
+
+    The first four bytes is the length of the header. Values of array_keys are
+    replaced in the header by {"$int32": [offset, length]} where offset is the
+    index of the first value among all arrays.
+    """
+    arrays = []
+    n_values = 0
+
+    def _extract_arrays(node):
+        nonlocal n_values
+        if not isinstance(node, dict):
+            return node
+        result = {}
+        for key, value in node.items():
+            if key in array_keys:
+                array = np.asarray(value, dtype="<i4")
+                result[key] = {"$int32": [n_values, len(array)]}
+                arrays.append(array)
+                n_values += len(array)
+            else:
+                result[key] = _extract_arrays(value)
+        return result
 
-    if reduce is not None:
-        n_true, tot = Fraction(reduce).limit_denominator(1000).as_integer_ratio()
-        cmap = itertools.cycle([1] * n_true + [0] * (tot - n_true))
-        records = itertools.compress(records, cmap)
-    return [r.split("\t") for r in records]
+    header = json.dumps(_extract_arrays(obj)).encode("utf-8")
+    # pad header to align the arrays to four bytes
+    header += b" " * (-(BINARY_HEADER.size + len(header)) % 4)
+    return b"".join(
+        [BINARY_HEADER.pack(len(header)), header, *(arr.tobytes() for arr in arrays)]
+    )
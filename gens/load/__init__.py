@@ -1,4 +1,6 @@
-from .annotations import (ParserError, parse_annotation_entry,
-                          parse_annotation_file, update_height_order)
+from .annotations import (ParserError, get_annotation_name,
+                          parse_annotation_entry, parse_annotation_file,
+                          read_annotation_file, set_height_order)
 from .chromosomes import build_chromosomes_obj, get_assembly_info
+from .sample_data import build_overview, build_sample_data, estimate_bin_sizes
 from .transcripts import build_transcripts
@@ -1,12 +1,12 @@
 """Annotations."""
 import csv
+import heapq
 import logging
 import re
+from collections import defaultdict
+from pathlib import Path
 
-from pymongo import ASCENDING
-
-from gens.constants import CHROMOSOMES
-from gens.db import ANNOTATIONS_COLLECTION
+from gens.db import region_bin
 
 LOG = logging.getLogger(__name__)
 CORE_FIELDS = ("sequence", "start", "end", "name", "strand", "color", "score")
@@ -77,12 +77,17 @@ def parse_annotation_entry(entry, genome_build, annotation_name):
     annotation["start"], annotation["end"] = sorted(
         [annotation["end"], annotation["start"]]
     )
+    try:
+        bin_number = region_bin(annotation["start"], annotation["end"])
+    except ValueError as err:
+        raise ParserError(str(err))
     # set missing fields to default values
     set_missing_fields(annotation, annotation_name)
     # set additional values
     annotation = {
         "source": annotation_name,
         "genome_build": genome_build,
+        "bin": bin_number,
         **annotation,
     }
     return annotation
@@ -129,40 +134,61 @@ def set_missing_fields(annotation, name):
             )
 
 
-def update_height_order(db, name):
-    """Updates height order for annotations.
+def set_height_order(annotations):
+    """Set height order of annotations.
 
-    Height order is used for annotation placement
+    Height order is used for annotation placement. Annotations are placed
+    on the lowest level that is free at their start position.
+    """
+    by_chrom = defaultdict(list)
+    for annot in annotations:
+        by_chrom[annot["chrom"]].append(annot)
+
+    for chrom_annotations in by_chrom.values():
+        free_levels = []  # heap of levels freed by earlier annotations
+        occupied = []  # heap of end position and level of placed annotations
+        n_levels = 0
+        for annot in sorted(chrom_annotations, key=lambda annot: annot["start"]):
+            # free levels of annotations ending before this one starts
+            while occupied and occupied[0][0] < annot["start"]:
+                heapq.heappush(free_levels, heapq.heappop(occupied)[1])
+            if free_levels:
+                level = heapq.heappop(free_levels)
+            else:
+                n_levels += 1
+                level = n_levels
+            annot["height_order"] = level
+            heapq.heappush(occupied, (annot["end"], level))
+    return annotations
+
+
+def get_annotation_name(annot_file):
+    """Get the name of annotations, which is based on the filename."""
+    annot_file = Path(annot_file)
+    return annot_file.name[: -len(annot_file.suffix)]
+
+
+def read_annotation_file(annot_file, genome_build):
+    """Read annotations of a bed or aed file and set their height order.
+
+    Returns the annotations and the number of rejected entries.
     """
-    for chrom in CHROMOSOMES:
-        annotations = (
-            db[ANNOTATIONS_COLLECTION]
-            .find({"chrom": chrom, "source": name})
-            .sort([("start", ASCENDING)])
-        )
-
-        height_tracker = [-1] * 200
-        current_height = 1
-        for annot in annotations:
-            while True:
-                if int(annot["start"]) > height_tracker[current_height - 1]:
-                    # Add height to DB
-                    db[ANNOTATIONS_COLLECTION].update_one(
-                        {"_id": annot["_id"], "source": annot["source"]},
-                        {"$set": {"height_order": current_height}},
-                    )
-
-                    # Keep track of added height order
-                    height_tracker[current_height - 1] = int(annot["end"])
-
-                    # Start from the beginning
-                    current_height = 1
-                    break
-
-                current_height += 1
-                # Extend height tracker
-                if len(height_tracker) < current_height:
-                    height_tracker += [-1] * 100
+    annot_file = Path(annot_file)
+    annotation_name = get_annotation_name(annot_file)
+    parser = parse_annotation_file(
+        annot_file, genome_build, file_format=annot_file.suffix[1:]
+    )
+    annotations = []
+    n_rejected = 0
+    for entry in parser:
+        try:
+            annotations.append(
+                parse_annotation_entry(entry, genome_build, annotation_name)
+            )
+        except ParserError as err:
+            LOG.warning(str(err))
+            n_rejected += 1
+    return set_height_order(annotations), n_rejected
 
 
 def parse_annotation_file(file, genome_build, file_format):
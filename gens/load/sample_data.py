@@ -0,0 +1,385 @@
+"""Build multi resolution coverage and BAF data files for Gens.
+
+Native replacement of utils/generate_gens_data.pl and utils/gvcfvaf.pl. The
+coverage and gVCF files are read once and every resolution is computed in the
+same pass with one worker process per chromosome.
+"""
+
+import gzip
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pysam
+
+from gens.constants import RESOLUTION_BIN_SIZES
+from gens.io import BAF_SUFFIX, COV_SUFFIX, JSON_SUFFIX
+from gens.store import STORE_SUFFIX, CoverageStore
+
+LOG = logging.getLogger(__name__)
+
+COV_WINDOW_SIZES = (100000, 25000, 5000, 1000, 100)
+BAF_SKIP_N = (160, 40, 10, 4, 1)
+PREFIXES = ("o", "a", "b", "c", "d")
+# minimum read depth of a gVCF record to calculate the BAF
+MIN_BAF_DEPTH = 10
+GVCF_END = re.compile(r"(?:^|;)END=([^;]*)")
+
+
+class CoverageWindow:
+    """Collect coverage regions into a window of a given size.
+
+    A window is ended when it is at least as large as the window size or
+    when there is a large gap to the next region.
+    """
+
+    def __init__(self, win_size):
+        self.win_size = win_size
+        self.start = None
+        self.end = None
+        self.ratios = []
+
+    def _pop(self):
+        """Get the mid point and mean ratio of the window and reset it."""
+        mid_point = self.start + (self.end - self.start) // 2
+        mean = sum(self.ratios) / len(self.ratios)
+        self.start, self.end, self.ratios = None, None, []
+        return mid_point, mean
+
+    def add(self, start, end, ratio):
+        """Add a region and return a window if one was ended."""
+        if self.start is None:
+            self.start, self.end = start, end
+        # If there is a large gap to the next region, prematurely end window
+        if start - self.end >= self.win_size:
+            window = self._pop()
+            self.start, self.end, self.ratios = start, end, [ratio]
+            return window
+        self.ratios.append(ratio)
+        self.end = end
+        if self.end - self.start + 1 >= self.win_size:
+            return self._pop()
+        return None
+
+    def flush(self):
+        """Return the last window of a chromosome."""
+        if self.start is None:
+            return None
+        return self._pop()
+
+
+def _format_record(prefix, chrom, position, value):
+    """Format a data point as a bed record using the number format of perl."""
+    return f"{prefix}_{chrom}\t{position - 1}\t{position}\t{value:.15g}\n"
+
+
+def _open_text(path):
+    """Open plain or gzipped text file."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def _tmp_path(tmp_dir, data_type, prefix, chrom):
+    """Get path to temporary file of a chromosome and resolution."""
+    return os.path.join(tmp_dir, f"{data_type}_{prefix}_{chrom}.bed")
+
+
+def build_coverage(chrom, data, tmp_dir):
+    """Calculate coverage windows of all resolutions for a chromosome.
+
+    The records are written to temporary files and the overview resolution is
+    returned as a list of position and value pairs.
+    """
+    windows = [CoverageWindow(size) for size in COV_WINDOW_SIZES]
+    outputs = [
+        open(_tmp_path(tmp_dir, "cov", prefix, chrom), "w") for prefix in PREFIXES
+    ]
+    overview = []
+
+    def write_window(prefix, out, window):
+        if window is None:
+            return
+        out.write(_format_record(prefix, chrom, *window))
+        if prefix == "o":
+            overview.append([window[0] - 1, window[1]])
+
+    try:
+        for line in data.decode("utf-8").splitlines():
+            _, start, end, ratio = line.split("\t")[:4]
+            start, end, ratio = int(start), int(end), float(ratio)
+            for prefix, window, out in zip(PREFIXES, windows, outputs):
+                write_window(prefix, out, window.add(start, end, ratio))
+        for prefix, window, out in zip(PREFIXES, windows, outputs):
+            write_window(prefix, out, window.flush())
+    finally:
+        for out in outputs:
+            out.close()
+    return overview
+
+
+def _to_number(value):
+    """Convert a gVCF value to a number, invalid values are treated as 0."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def gvcf_position(fields):
+    """Get the start and end position of a gVCF record."""
+    match = GVCF_END.search(fields[7])
+    start = int(fields[1])
+    end = int(match.group(1)) if match and match.group(1) else start
+    return start, end
+
+
+def gvcf_frequency(fields):
+    """Get the B-allele frequency of a gVCF record.
+
+    Returns None for indels, alternative alleles that are not SNVs and records
+    with too low read depth.
+    """
+    if len(fields[3]) > 1:
+        return None
+    if ":AD:" not in fields[8]:
+        return 0.0
+
+    alts = fields[4].split(",")
+    alt, alt_cnt, depth = 0, 0, 0
+    for key, value in zip(fields[8].split(":"), fields[9].split(":")):
+        if key == "GT":
+            genotype = value.split("/")
+            alt = int(_to_number(genotype[1])) if len(genotype) > 1 else 0
+            if alt != 0 and (alt > len(alts) or len(alts[alt - 1]) > 1):
+                return None
+        elif key == "AD":
+            counts = value.split(",")
+            if alt != 0:
+                alt_cnt = _to_number(counts[alt]) if alt < len(counts) else 0
+            else:
+                # exclude the reference and <NON_REF> allele counts
+                alt_cnt = max((_to_number(cnt) for cnt in counts[1:-1]), default=0)
+        elif key == "DP":
+            depth = _to_number(value)
+            break
+    if depth < MIN_BAF_DEPTH:
+        return None
+    return alt_cnt / depth
+
+
+def baf_records(gvcf_records, positions):
+    """Get the BAF of SNP positions from the gVCF records of a chromosome.
+
+    Both the gVCF records and the positions are expected to be sorted.
+    """
+    records = (line.split("\t") for line in gvcf_records)
+    fields = next(records, None)
+    if fields is None:
+        return
+    rec_start, rec_end = gvcf_position(fields)
+    for pos in positions:
+        if rec_start < pos:
+            for fields in records:
+                rec_start, rec_end = gvcf_position(fields)
+                if rec_end >= pos or rec_start >= pos:
+                    break
+            else:
+                # no more records on the chromosome
+                return
+        if rec_start <= pos <= rec_end:
+            frq = gvcf_frequency(fields)
+            if frq is not None:
+                yield pos, frq
+
+
+def build_baf(chrom, gvcf_file, positions, tmp_dir):
+    """Calculate BAF of all resolutions for a chromosome.
+
+    The records are written to temporary files and the overview resolution is
+    returned as a list of position and value pairs.
+    """
+    outputs = [
+        open(_tmp_path(tmp_dir, "baf", prefix, chrom), "w") for prefix in PREFIXES
+    ]
+    overview = []
+    try:
+        with pysam.TabixFile(gvcf_file) as gvcf:
+            records = baf_records(gvcf.fetch(chrom), positions)
+            for i, (pos, frq) in enumerate(records):
+                for prefix, skip, out in zip(PREFIXES, BAF_SKIP_N, outputs):
+                    if i % skip == 0:
+                        out.write(_format_record(prefix, chrom, pos, frq))
+                        if prefix == "o":
+                            overview.append([pos - 1, frq])
+    finally:
+        for out in outputs:
+            out.close()
+    return overview
+
+
+def _first_positions(coverage_file, prefix, n_records):
+    """Get positions of the first records of a resolution in a coverage file."""
+    if coverage_file.endswith(STORE_SUFFIX):
+        store = CoverageStore(coverage_file)
+        names = [name for name in store.index if name.startswith(f"{prefix}_")]
+        return store.fetch(names[0])[0][:n_records] if names else []
+    with pysam.TabixFile(coverage_file) as tbix:
+        names = [name for name in tbix.contigs if name.startswith(f"{prefix}_")]
+        if not names:
+            return []
+        records = itertools.islice(tbix.fetch(names[0]), n_records)
+        return [int(record.split("\t")[1]) for record in records]
+
+
+def estimate_bin_sizes(coverage_file, n_records=1000):
+    """Estimate the bin size of each resolution in a coverage file.
+
+    The bin size is the median distance between the first data points of a
+    resolution. Default bin sizes are used for resolutions with too few points.
+    """
+    bin_sizes = dict(RESOLUTION_BIN_SIZES)
+    for prefix in bin_sizes:
+        positions = _first_positions(coverage_file, prefix, n_records)
+        if len(positions) > 1:
+            bin_sizes[prefix] = max(1, int(np.median(np.diff(positions))))
+    return bin_sizes
+
+
+def read_gnomad_positions(gnomad_file):
+    """Read SNP positions per chromosome from a file of chromosome and position."""
+    positions = {}
+    with _open_text(gnomad_file) as gnomad:
+        for line in gnomad:
+            chrom, pos = line.rstrip("\n").split("\t")[:2]
+            positions.setdefault(chrom, []).append(int(pos))
+    return positions
+
+
+def _read_coverage_chroms(coverage_file):
+    """Read standardized coverage file as one chunk of lines per chromosome."""
+    opener = gzip.open if coverage_file.endswith(".gz") else open
+    with opener(coverage_file, "rb") as cov:
+        lines = (
+            line
+            for line in cov
+            if not line.startswith((b"@", b"CONTIG")) and line.strip()
+        )
+        for chrom, chrom_lines in itertools.groupby(
+            lines, key=lambda line: line.split(b"\t", 1)[0]
+        ):
+            yield chrom.decode("utf-8"), b"".join(chrom_lines)
+
+
+def _write_tabix(out_file, data_type, chroms, tmp_dir):
+    """Concatenate temporary files into a bgzipped and tabix indexed bed file."""
+    LOG.info(f"Writing {out_file}")
+    with pysam.BGZFile(out_file, "wb") as out:
+        for prefix in PREFIXES:
+            for chrom in chroms:
+                with open(_tmp_path(tmp_dir, data_type, prefix, chrom), "rb") as tmp:
+                    shutil.copyfileobj(tmp, out)
+    pysam.tabix_index(out_file, preset="bed", force=True)
+
+
+def build_sample_data(
+    sample_id,
+    coverage_file,
+    gvcf_file,
+    gnomad_file,
+    outdir,
+    overview=False,
+    processes=None,
+):
+    """Build coverage and BAF files of a sample.
+
+    The gVCF needs to be bgzipped and tabix indexed. Returns the paths of the
+    written files.
+    """
+    with pysam.TabixFile(gvcf_file) as gvcf:
+        gvcf_chroms = set(gvcf.contigs)
+    positions = read_gnomad_positions(gnomad_file)
+    baf_chroms = [chrom for chrom in positions if chrom in gvcf_chroms]
+
+    processes = processes or os.cpu_count()
+    cov_chroms, cov_jobs, baf_jobs = [], {}, {}
+    os.makedirs(outdir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=outdir) as tmp_dir, ProcessPoolExecutor(
+        processes
+    ) as executor:
+        for chrom in baf_chroms:
+            baf_jobs[chrom] = executor.submit(
+                build_baf, chrom, gvcf_file, positions[chrom], tmp_dir
+            )
+        # limit the number of chromosomes waiting in memory for a worker
+        max_pending = 2 * processes
+        for chrom, data in _read_coverage_chroms(coverage_file):
+            LOG.info(f"Calculating coverage of chromosome {chrom}")
+            cov_chroms.append(chrom)
+            cov_jobs[chrom] = executor.submit(build_coverage, chrom, data, tmp_dir)
+            pending = [job for job in cov_jobs.values() if not job.done()]
+            if len(pending) >= max_pending:
+                wait(pending, return_when=FIRST_COMPLETED)
+
+        overview_data = {}
+        for data_type, jobs in [("cov", cov_jobs), ("baf", baf_jobs)]:
+            for chrom, job in jobs.items():
+                chrom_data = overview_data.setdefault(chrom, {"cov": [], "baf": []})
+                chrom_data[data_type] = job.result()
+
+        files = {
+            "coverage": os.path.join(outdir, sample_id + COV_SUFFIX),
+            "baf": os.path.join(outdir, sample_id + BAF_SUFFIX),
+        }
+        _write_tabix(files["coverage"], "cov", cov_chroms, tmp_dir)
+        _write_tabix(files["baf"], "baf", baf_chroms, tmp_dir)
+
+    if overview:
+        files["overview"] = os.path.join(outdir, sample_id + JSON_SUFFIX)
+        write_overview(files["overview"], overview_data)
+    return files
+
+
+def _read_resolution(data_file, prefix):
+    """Read positions and values of a resolution per chromosome in a data file."""
+    if data_file.endswith(STORE_SUFFIX):
+        store = CoverageStore(data_file)
+        for name in store.index:
+            if name.startswith(f"{prefix}_"):
+                positions, values = store.fetch(name)
+                yield name[len(prefix) + 1 :], positions.tolist(), values.tolist()
+        return
+    with pysam.TabixFile(data_file) as tbix:
+        for name in tbix.contigs:
+            if name.startswith(f"{prefix}_"):
+                rows = [record.split("\t") for record in tbix.fetch(name)]
+                positions = [int(row[1]) for row in rows]
+                values = [float(row[3]) for row in rows]
+                yield name[len(prefix) + 1 :], positions, values
+
+
+def write_overview(overview_file, overview_data):
+    """Write overview data as gzipped json."""
+    LOG.info(f"Writing {overview_file}")
+    with gzip.open(overview_file, "wt") as json_gz:
+        json.dump(overview_data, json_gz, separators=(",", ":"))
+
+
+def build_overview(coverage_file, baf_file, overview_file):
+    """Build an overview file from the overview resolution of sample data files.
+
+    Coverage files can be either tabix indexed bed files or coverage stores.
+    """
+    overview_data = {}
+    for data_type, data_file in [("cov", coverage_file), ("baf", baf_file)]:
+        for chrom, positions, values in _read_resolution(data_file, "o"):
+            chrom_data = overview_data.setdefault(chrom, {"cov": [], "baf": []})
+            chrom_data[data_type] = [list(rec) for rec in zip(positions, values)]
+    write_overview(overview_file, overview_data)
+    return overview_file
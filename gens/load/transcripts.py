@@ -1,14 +1,20 @@
 """Load transcripts into database"""
 
 import csv
+import gzip
+import io
 import logging
-from collections import defaultdict
-from itertools import chain
+from pathlib import Path
 
 import click
 
+from gens.db import gene_name_key, region_bin
+
 LOG = logging.getLogger(__name__)
 
+# Number of lines read between updates of the progress bar
+PROGRESS_INTERVAL = 10000
+
 
 def parse_mane_transc(mane_file):
     """Parse mane tranascript file and index on ensemble id."""
@@ -37,11 +43,26 @@ def _parse_attribs(attribs):
     )
 
 
-def _count_file_len(file):
-    """Count number of lines in file."""
-    n_lines = sum(1 for line in file)
-    file.seek(0)  # reset file to begining
-    return n_lines
+def _read_lines(path, label):
+    """Read lines of a plain or gzipped text file with a progress bar.
+
+    The progress is tracked by the number of bytes read from the file.
+    """
+    path = Path(path)
+    with open(path, "rb") as raw_file, click.progressbar(
+        length=path.stat().st_size, label=label
+    ) as bar:
+        if path.suffix == ".gz":
+            text_file = gzip.open(raw_file, "rt")
+        else:
+            text_file = io.TextIOWrapper(raw_file)
+        n_read = 0
+        for line_no, line in enumerate(text_file):
+            yield line
+            if line_no % PROGRESS_INTERVAL == 0:
+                bar.update(raw_file.tell() - n_read)
+                n_read = raw_file.tell()
+        bar.update(bar.length - n_read)
 
 
 def parse_transcript_gtf(transc_file, delimiter="\t"):
@@ -114,56 +135,69 @@ def _sort_transcript_features(transcripts):
         tr["features"] = sorted(tr["features"], key=lambda x: x["start"])
 
 
+def _finish_gene(transcripts):
+    """Assign height order and sort features of the transcripts of a gene."""
+    _assign_height_order(transcripts)
+    _sort_transcript_features(transcripts)
+    return transcripts
+
+
 def build_transcripts(transc_file, mane_file, genome_build):
-    """Build transcript object from transcript and mane file."""
+    """Build transcript objects from a plain or gzipped GTF file and mane file.
+
+    The GTF file is read as a stream where the records of a gene are
+    expected to be grouped together. Transcripts are yielded gene by gene.
+    """
     mane_transc = parse_mane_transc(mane_file)
-    results = defaultdict(list)
+    gene_id = None
+    gene_transcripts = []
     transc_index = {}
-    n_lines = _count_file_len(transc_file)
-    with click.progressbar(
-        transc_file, length=n_lines, label="Processing transcripts"
-    ) as bar:
-        for transc, attribs in parse_transcript_gtf(bar):
-            transcript_id = attribs.get("transcript_id")
-            # store transcripts in index
-            if transc["feature"] == "transcript":
-                selected_name = mane_transc.get(transcript_id, {})
-                res = {
-                    "chrom": transc["seqname"],
-                    "genome_build": int(genome_build),
-                    "gene_name": attribs["gene_name"],
-                    "start": int(transc["start"]),
-                    "end": int(transc["end"]),
-                    "strand": transc["strand"],
-                    "height_order": None,  # will be set later
-                    "transcript_id": transcript_id,
-                    "transcript_biotype": attribs["transcript_biotype"],
-                    "mane": selected_name.get("mane_status"),
-                    "hgnc_id": selected_name.get("hgnc_id"),
-                    "refseq_id": selected_name.get("refseq_id"),
-                    "features": [],
-                }
-                transc_index[transcript_id] = res
-                results[attribs["gene_name"]].append(res)
-            elif transc["feature"] in ["exon", "three_prime_utr", "five_prime_utr"]:
-                # add features to existing transcript
-                if transcript_id in transc_index:
-                    specific_params = {}
-                    if transc["feature"] == "exon":
-                        specific_params["exon_number"] = int(attribs["exon_number"])
-                    transc_index[transcript_id]["features"].append(
-                        {
-                            **{
-                                "feature": transc["feature"],
-                                "start": int(transc["start"]),
-                                "end": int(transc["end"]),
-                            },
-                            **specific_params,
-                        }
-                    )
-
-    LOG.info("Assign height order values and sort features")
-    for transcripts in results.values():
-        _assign_height_order(transcripts)
-        _sort_transcript_features(transcripts)
-    return chain(*results.values())
+    lines = _read_lines(transc_file, label="Processing transcripts")
+    for transc, attribs in parse_transcript_gtf(lines):
+        transcript_id = attribs.get("transcript_id")
+        # store transcripts in index
+        if transc["feature"] == "transcript":
+            # the previous gene is complete when a new gene starts
+            transc_gene_id = attribs.get("gene_id", attribs["gene_name"])
+            if transc_gene_id != gene_id:
+                yield from _finish_gene(gene_transcripts)
+                gene_id = transc_gene_id
+                gene_transcripts = []
+                transc_index = {}
+            selected_name = mane_transc.get(transcript_id, {})
+            res = {
+                "chrom": transc["seqname"],
+                "genome_build": int(genome_build),
+                "gene_name": attribs["gene_name"],
+                "gene_name_key": gene_name_key(attribs["gene_name"]),
+                "start": int(transc["start"]),
+                "end": int(transc["end"]),
+                "bin": region_bin(int(transc["start"]), int(transc["end"])),
+                "strand": transc["strand"],
+                "height_order": None,  # will be set later
+                "transcript_id": transcript_id,
+                "transcript_biotype": attribs["transcript_biotype"],
+                "mane": selected_name.get("mane_status"),
+                "hgnc_id": selected_name.get("hgnc_id"),
+                "refseq_id": selected_name.get("refseq_id"),
+                "features": [],
+            }
+            transc_index[transcript_id] = res
+            gene_transcripts.append(res)
+        elif transc["feature"] in ["exon", "three_prime_utr", "five_prime_utr"]:
+            # add features to existing transcript
+            if transcript_id in transc_index:
+                specific_params = {}
+                if transc["feature"] == "exon":
+                    specific_params["exon_number"] = int(attribs["exon_number"])
+                transc_index[transcript_id]["features"].append(
+                    {
+                        **{
+                            "feature": transc["feature"],
+                            "start": int(transc["start"]),
+                            "end": int(transc["end"]),
+                        },
+                        **specific_params,
+                    }
+                )
+    yield from _finish_gene(gene_transcripts)
@@ -0,0 +1,98 @@
+"""Speculative prefetching of coverage next to the viewed region."""
+import logging
+import threading
+
+from .graph import select_resolution
+from .io import get_tabix_files, tile_query
+from .workers import WorkerPool
+
+LOG = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Warm the tile cache with regions that are likely to be viewed next.
+
+    Queued jobs of a sample are cancelled when another region of the sample
+    is requested and new jobs are dropped when the queue is full.
+    """
+
+    def __init__(self, pool, max_queued=16):
+        self.pool = pool
+        self.max_queued = max_queued
+        self.enabled = False
+        self._generations = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure prefetching from the app configuration."""
+        self.enabled = app.config.get("COVERAGE_PREFETCH", self.enabled)
+        self.max_queued = app.config.get("PREFETCH_QUEUE_SIZE", self.max_queued)
+        self.pool.init_app(app)
+
+    def _run(self, key, generation, func, *args):
+        """Run job unless a newer region has been requested."""
+        if self._generations.get(key) != generation:
+            return
+        try:
+            func(*args)
+        except Exception as err:
+            LOG.warning(f"Prefetching failed - {type(err).__name__}: {err}")
+
+    def schedule(self, key, func, jobs):
+        """Cancel queued jobs of key and queue func for each tuple of args."""
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            for job in self._jobs.pop(key, []):
+                job.cancel()
+            # prune finished jobs and keys without queued or running jobs
+            self._jobs = {
+                k: [job for job in k_jobs if not job.done()]
+                for k, k_jobs in self._jobs.items()
+            }
+            self._jobs = {k: k_jobs for k, k_jobs in self._jobs.items() if k_jobs}
+            self._generations = {
+                k: gen
+                for k, gen in self._generations.items()
+                if k == key or k in self._jobs
+            }
+            n_queued = sum(len(k_jobs) for k_jobs in self._jobs.values())
+            n_free = max(0, self.max_queued - n_queued)
+            if n_free < len(jobs):
+                LOG.debug(f"Prefetch queue is full, dropping {len(jobs) - n_free} jobs")
+            if n_free > 0 and jobs:
+                self._jobs[key] = [
+                    self.pool.submit(self._run, key, generation, func, *args)
+                    for args in jobs[:n_free]
+                ]
+
+
+prefetcher = Prefetcher(
+    WorkerPool("gens-prefetch", "PREFETCH_WORKERS", max_workers=2)
+)
+
+
+def prefetch_regions(region, start, end, x_ampl, bin_sizes=None):
+    """Get regions next to a viewed region and of the next zoom level.
+
+    The viewed region is given as a REGION and its padded start and end.
+    """
+    span = end - start
+    regions = [
+        (region.res, region.chrom, max(0, start - span), start),
+        (region.res, region.chrom, end, end + span),
+    ]
+    # zooming in keeps the central 60% of the region
+    zoom_res = select_resolution(
+        0.6 * (region.end_pos - region.start_pos), x_ampl, bin_sizes
+    )
+    if zoom_res != region.res:
+        regions.append((zoom_res, region.chrom, start + span // 5, end - span // 5))
+    return [reg for reg in regions if reg[2] < reg[3]]
+
+
+def warm_coverage(sample_obj, res, chrom, start, end):
+    """Read coverage and BAF of a region into the tile cache."""
+    for tbix in get_tabix_files(sample_obj.coverage_file, sample_obj.baf_file):
+        tile_query(tbix, res, chrom, start, end)
@@ -0,0 +1,176 @@
+"""Memory-mapped binary coverage store.
+
+A store file holds the positions and values of every resolution and chromosome
+in a sample data file as sorted arrays. The file layout is
+
+    magic (8 bytes) | index offset (uint64) | arrays ... | json index
+
+where the index maps record names, such as "a_1", to the offset and length of
+the position (int64) and value (float64) arrays of the record.
+"""
+import gzip
+import itertools
+import json
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .io import _get_filepath, reduce_arrays
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b"GENSCOV1"
+HEADER = struct.Struct("<8sQ")
+POS_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f8")
+BED_SUFFIX = ".bed.gz"
+STORE_SUFFIX = ".gens"
+
+
+class CoverageStore:
+    """Read records from a memory-mapped coverage store."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._data = np.memmap(filename, dtype=np.uint8, mode="r")
+        magic, index_offset = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a Gens coverage store")
+        self.index = json.loads(self._data[index_offset:].tobytes().decode("utf-8"))
+
+    def _array(self, offset, length, dtype):
+        """Get a zero-copy view of an array in the store."""
+        return np.frombuffer(self._data, dtype=dtype, count=length, offset=offset)
+
+    def fetch(self, record_name, start=None, end=None):
+        """Get positions and values of a record within [start, end)."""
+        if record_name not in self.index:
+            raise ValueError(f"could not find record {record_name} in {self.filename}")
+        record = self.index[record_name]
+        positions = self._array(record["positions"], record["length"], POS_DTYPE)
+        values = self._array(record["values"], record["length"], VALUE_DTYPE)
+        # lookup region with binary search
+        first = 0 if start is None else np.searchsorted(positions, start, "left")
+        last = (
+            len(positions) if end is None else np.searchsorted(positions, end, "left")
+        )
+        return positions[first:last], values[first:last]
+
+
+def write_store(filename, records):
+    """Write records of (record name, positions, values) to a coverage store."""
+    index = {}
+    with open(filename, "wb") as out:
+        out.write(HEADER.pack(MAGIC, 0))
+        for record_name, positions, values in records:
+            positions = np.asarray(positions, dtype=POS_DTYPE)
+            values = np.asarray(values, dtype=VALUE_DTYPE)
+            # ensure that positions are sorted
+            order = np.argsort(positions, kind="stable")
+            index[record_name] = {"length": len(positions)}
+            for name, array in [("positions", positions), ("values", values)]:
+                index[record_name][name] = out.tell()
+                out.write(array[order].tobytes())
+        index_offset = out.tell()
+        out.write(json.dumps(index).encode("utf-8"))
+        # write location of the index to the header
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, index_offset))
+
+
+def _parse_bed_records(bed_file):
+    """Parse a bgzipped bed file into arrays of positions and values per record."""
+    with gzip.open(bed_file, "rt") as bed:
+        lines = (line.rstrip("\n").split("\t") for line in bed if line.strip())
+        for record_name, rows in itertools.groupby(lines, key=lambda row: row[0]):
+            positions, values = zip(*((int(r[1]), float(r[3])) for r in rows))
+            yield record_name, positions, values
+
+
+def convert_bed_to_store(bed_file):
+    """Convert a bgzipped Gens bed file to a coverage store.
+
+    The store is written next to the bed file and its path is returned.
+    """
+    if bed_file.endswith(STORE_SUFFIX):
+        return bed_file
+    if not bed_file.endswith(BED_SUFFIX):
+        raise ValueError(f"Expected a {BED_SUFFIX} file, got {bed_file}")
+    store_file = bed_file[: -len(BED_SUFFIX)] + STORE_SUFFIX
+    LOG.info(f"Converting {bed_file} to coverage store {store_file}")
+    write_store(store_file, _parse_bed_records(bed_file))
+    return store_file
+
+
+def _store_version(path):
+    """Get values that change when a store file is replaced."""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class StorePool:
+    """Size bounded LRU pool of opened coverage stores.
+
+    Stores are shared between threads as they are only read. A store is
+    opened again if its file has been replaced.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure pool size from the app configuration."""
+        # a sample needs both the coverage and baf store to be open
+        self.maxsize = max(2, app.config.get("STORE_POOL_SIZE", self.maxsize))
+
+    def get(self, path):
+        """Get an opened coverage store for path."""
+        version = _store_version(path)
+        with self._lock:
+            if path in self._stores:
+                open_version, store = self._stores[path]
+                if open_version == version:
+                    self._stores.move_to_end(path)
+                    return store
+                LOG.info(f"Reopening replaced coverage store: {path}")
+        store = CoverageStore(path)
+        with self._lock:
+            self._stores[path] = (version, store)
+            self._stores.move_to_end(path)
+            # drop least recently used stores
+            while len(self._stores) > self.maxsize:
+                self._stores.popitem(last=False)
+        return store
+
+    def clear(self):
+        """Remove all opened stores."""
+        with self._lock:
+            self._stores.clear()
+
+
+store_pool = StorePool()
+
+
+def get_store_files(coverage_file, baf_file):
+    """Get coverage stores for sample."""
+    cov_file = store_pool.get(_get_filepath(coverage_file))
+    baf_file = store_pool.get(_get_filepath(baf_file))
+    return cov_file, baf_file
+
+
+def store_query(store, res, chrom, start=None, end=None, reduce=None):
+    """Get arrays of positions and values in a region from a coverage store."""
+    record_name = f"{res}_{chrom}"
+    LOG.info(f"Query {store.filename}; {record_name} {start} {end}; reduce: {reduce}")
+    try:
+        positions, values = store.fetch(record_name, start, end)
+    except ValueError as err:
+        LOG.error(err)
+        return np.empty(0), np.empty(0)
+    return reduce_arrays(positions, values, reduce)
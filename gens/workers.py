@@ -0,0 +1,44 @@
+"""Thread pools for running work concurrently within a worker process."""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+LOG = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """Bounded thread pool that is shared between requests.
+
+    Threads are kept between requests to let them reuse per-thread resources,
+    such as pooled tabix files. The pool is created on first use to make it
+    safe to fork the process after the app has been initialized.
+    """
+
+    def __init__(self, name, config_key, max_workers):
+        self.name = name
+        self.config_key = config_key
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure number of workers from the app configuration."""
+        self.max_workers = app.config.get(self.config_key, self.max_workers)
+
+    @property
+    def executor(self):
+        """Get the thread pool of the current process."""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                LOG.debug(f"Starting {self.name} pool with {self.max_workers} workers")
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule func to be run by the pool."""
+        return self.executor.submit(func, *args, **kwargs)
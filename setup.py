@@ -28,6 +28,7 @@ setup(
         "Click",
         "Flask",
         "flask-caching",
+        "numpy",
         "pymongo>=3.9.0",
         "gtfparse>=1.2.0",
         "pysam>=0.15.4",
@@ -0,0 +1,242 @@
+"""Test queries of annotations and transcripts."""
+
+import random
+import time
+from operator import itemgetter
+
+import mongomock
+import pytest
+from flask import Flask
+
+from gens.db import (VariantCategory, add_missing_bins,
+                     add_missing_gene_name_keys, annotation, gene_name_key,
+                     query_gene_names, query_gene_region,
+                     query_records_in_region, query_region_density,
+                     query_variants, region_bin)
+from gens.db.annotation import ANNOTATIONS, TRANSCRIPTS, get_case_id
+from gens.db.intervals import interval_density
+
+
+def _transcript(gene_name, chrom, start, end, genome_build=38):
+    return {
+        "gene_name": gene_name,
+        "gene_name_key": gene_name_key(gene_name),
+        "chrom": chrom,
+        "start": start,
+        "end": end,
+        "genome_build": genome_build,
+    }
+
+
+def test_query_genes():
+    """Test looking up regions and names of genes ignoring case."""
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens
+    app.config["GENS_DB"][TRANSCRIPTS].insert_many(
+        [
+            _transcript("BRCA1", "17", 300, 400),
+            _transcript("BRCA1", "17", 200, 350),
+            _transcript("BRCA1", "17", 100, 150, genome_build=19),
+            _transcript("BRCA2", "13", 500, 600),
+            _transcript("BRD4", "19", 700, 800),
+        ]
+    )
+    with app.app_context():
+        assert query_gene_region("brca1", 38) == {
+            "chrom": "17",
+            "genome_build": 38,
+            "start": 200,
+            "end": 400,
+        }
+        assert query_gene_region("brca1")["start"] == 100
+        assert query_gene_region("brca3") is None
+
+        assert query_gene_names("br", 38) == ["BRCA1", "BRCA2", "BRD4"]
+        assert query_gene_names("BRC", 38, limit=1) == ["BRCA1"]
+        assert query_gene_names("b.", 38) == []
+
+    # transcripts loaded without gene name keys are found once they are added
+    app.config["GENS_DB"][TRANSCRIPTS].insert_one(
+        {"gene_name": "TP53", "chrom": "17", "start": 10, "end": 20, "genome_build": 38}
+    )
+    assert add_missing_gene_name_keys(app.config["GENS_DB"]) == 1
+    with app.app_context():
+        assert query_gene_region("tp53", 38)["start"] == 10
+
+
+def test_region_bins():
+    """Test that binned region queries find all overlapping records."""
+    rng = random.Random(0)
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens
+    records = []
+    for _ in range(500):
+        start = rng.randrange(0, 50_000_000)
+        end = start + rng.choice([10, 10_000, 500_000, 5_000_000])
+        records.append({"chrom": "1", "genome_build": 38, "start": start, "end": end})
+    app.config["GENS_DB"][TRANSCRIPTS].insert_many([{**rec} for rec in records])
+    assert add_missing_bins(app.config["GENS_DB"], TRANSCRIPTS) == len(records)
+    with app.app_context():
+        for start_pos, end_pos in [(0, 100), (1_000_000, 1_200_000), (0, 60_000_000)]:
+            found = query_records_in_region(TRANSCRIPTS, "1", start_pos, end_pos, 38)
+            expected = [
+                rec
+                for rec in records
+                if rec["start"] <= end_pos and rec["end"] >= start_pos
+            ]
+            assert sorted(r["start"] for r in found) == sorted(
+                r["start"] for r in expected
+            )
+
+
+def test_interval_index():
+    """Test that in-memory interval indexes give the same records as the database."""
+    rng = random.Random(1)
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens
+    records = []
+    for _ in range(300):
+        start = rng.randrange(0, 10_000_000)
+        end = start + rng.choice([0, 1000, 100_000, 2_000_000])
+        records.append(
+            {
+                "chrom": rng.choice(["1", "2"]),
+                "genome_build": 38,
+                "start": start,
+                "end": end,
+                "bin": region_bin(start, end),
+                "height_order": rng.randint(1, 3),
+                "features": [{"start": start, "end": end}],
+            }
+        )
+    app.config["GENS_DB"][TRANSCRIPTS].insert_many(records)
+    regions = [(0, 10), (500_000, 600_000), (5_000_000, 5_000_000), (0, 20_000_000)]
+    with app.app_context():
+        for height_order in [None, 1]:
+            for start_pos, end_pos in regions:
+                args = (TRANSCRIPTS, "1", start_pos, end_pos, 38, height_order)
+                app.config["ANNOTATION_INDEX"] = False
+                expected = list(query_records_in_region(*args))
+                app.config["ANNOTATION_INDEX"] = True
+                found = query_records_in_region(*args)
+                key = itemgetter("start", "height_order", "end")
+                assert sorted(found, key=key) == sorted(expected, key=key)
+                assert [rec["start"] for rec in found] == [
+                    rec["start"] for rec in expected
+                ]
+
+        # fields can be left out of the records
+        for use_index in [False, True]:
+            app.config["ANNOTATION_INDEX"] = use_index
+            found = query_records_in_region(
+                TRANSCRIPTS, "1", 0, 20_000_000, 38, exclude_fields=("features",)
+            )
+            assert all("features" not in rec for rec in found)
+
+
+def test_region_density():
+    """Test counting records overlapping bins of a region."""
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens
+    app.config["GENS_DB"][ANNOTATIONS].insert_many(
+        [
+            {"start": start, "end": end, "bin": region_bin(start, end)}
+            for start, end in [(0, 99), (50, 250), (120, 130), (500, 600)]
+        ],
+    )
+    app.config["GENS_DB"][ANNOTATIONS].update_many(
+        {}, {"$set": {"chrom": "1", "genome_build": "38", "source": "a"}}
+    )
+    with app.app_context():
+        for use_index in [False, True]:
+            app.config["ANNOTATION_INDEX"] = use_index
+            counts = query_region_density(ANNOTATIONS, "1", 0, 299, "38", 3, source="a")
+            assert counts.tolist() == [2, 2, 1]
+
+
+def test_region_density_in_database():
+    """Test that the database counts records in bins like the interval index."""
+    rng = random.Random(2)
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens_density
+    records = []
+    for _ in range(300):
+        start = rng.randrange(0, 2_000_000)
+        end = start + rng.choice([0, 100, 50_000, 700_000])
+        records.append(
+            {
+                "chrom": "1",
+                "genome_build": 38,
+                "start": start,
+                "end": end,
+                "bin": region_bin(start, end),
+            }
+        )
+    app.config["GENS_DB"][ANNOTATIONS].insert_many([{**rec} for rec in records])
+    starts = [rec["start"] for rec in records]
+    ends = [rec["end"] for rec in records]
+    with app.app_context():
+        for start_pos, end_pos, n_bins in [(0, 2_700_000, 100), (123_456, 654_321, 7)]:
+            counts = query_region_density(
+                ANNOTATIONS, "1", start_pos, end_pos, 38, n_bins
+            )
+            expected = interval_density(starts, ends, start_pos, end_pos, n_bins)
+            assert counts.tolist() == expected.tolist()
+
+
+def test_query_variants():
+    """Test that variants are projected, capped and the case id is cached."""
+    app = Flask(__name__)
+    app.config["SCOUT_DB"] = mongomock.MongoClient().scout
+    app.config["SCOUT_DB"].case.insert_one({"_id": "c1", "display_name": "case"})
+    app.config["SCOUT_DB"].variant.insert_many(
+        [
+            {
+                "case_id": "c1",
+                "category": "sv",
+                "variant_type": "clinical",
+                "chromosome": "1",
+                "position": pos,
+                "end": pos + 10,
+                "rank_score": pos,
+                "genotype_calls": [],
+            }
+            for pos in [100, 200, 300]
+        ],
+    )
+    with app.app_context():
+        variants = list(query_variants("case", VariantCategory.SINGLE_VAR, limit=2))
+        assert [var["position"] for var in variants] == [300, 200]
+        assert "genotype_calls" not in variants[0]
+        # the case id is read from the cache
+        app.config["SCOUT_DB"].case.delete_many({})
+        variants = query_variants(
+            "case",
+            VariantCategory.SINGLE_VAR,
+            chromosome="1",
+            start_pos=150,
+            end_pos=250,
+        )
+        assert [var["position"] for var in variants] == [200]
+        with pytest.raises(ValueError):
+            get_case_id("other")
+
+
+def test_case_id_cache_is_bounded(monkeypatch):
+    """Test that expired and the oldest case ids are removed from the cache."""
+    app = Flask(__name__)
+    app.config["SCOUT_DB"] = mongomock.MongoClient().scout
+    app.config["SCOUT_DB"].case.insert_many(
+        [{"_id": f"c{idx}", "display_name": f"case{idx}"} for idx in range(3)]
+    )
+    monkeypatch.setattr(annotation, "_case_ids", annotation.OrderedDict())
+    monkeypatch.setattr(annotation, "CASE_ID_CACHE_SIZE", 2)
+    with app.app_context():
+        for idx in range(3):
+            assert get_case_id(f"case{idx}") == f"c{idx}"
+        assert [name for _, name in annotation._case_ids] == ["case1", "case2"]
+        # expired case ids are dropped when a case id is added
+        expired = time.monotonic() + annotation.CASE_ID_TIMEOUT
+        monkeypatch.setattr(annotation.time, "monotonic", lambda: expired)
+        get_case_id("case0")
+        assert [name for _, name in annotation._case_ids] == ["case0"]
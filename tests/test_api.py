@@ -0,0 +1,210 @@
+"""Test api endpoints with the test client."""
+
+import json
+import uuid
+
+import mongomock
+import pysam
+import pytest
+from flask import current_app, request
+
+from gens import api
+from gens import app as gens_app
+from gens import conditional
+from gens.cache import cache
+from gens.db import (CHROMSIZES_COLLECTION, TRANSCRIPTS_COLLECTION, region_bin,
+                     store_sample)
+
+
+def _init_test_database():
+    # process wide caches are keyed on the database, use unique names
+    client = mongomock.MongoClient()
+    name = uuid.uuid4().hex
+    current_app.config["SCOUT_DB"] = client[f"scout_{name}"]
+    current_app.config["GENS_DB"] = client[f"gens_{name}"]
+
+
+@pytest.fixture(name="app")
+def fixture_app(monkeypatch):
+    """Gens app with an in-memory database."""
+    monkeypatch.setattr(gens_app, "init_database", _init_test_database)
+    app = gens_app.create_app()
+    app.config["TESTING"] = True
+    app.config["GENS_DB"][CHROMSIZES_COLLECTION].insert_many(
+        [
+            {"chrom": chrom, "genome_build": 38, "size": 30_000_000, "scale": 0.1}
+            for chrom in ["1", "2"]
+        ]
+    )
+    with app.app_context():
+        cache.clear()
+    return app
+
+
+def test_transcript_features_by_resolution(app):
+    """Test that exons and UTRs are only returned at resolutions c and d."""
+    app.config["GENS_DB"][TRANSCRIPTS_COLLECTION].insert_one(
+        {
+            "chrom": "1",
+            "genome_build": 38,
+            "start": 5000,
+            "end": 9000,
+            "bin": region_bin(5000, 9000),
+            "height_order": 1,
+            "gene_name": "GENE1",
+            "features": [{"feature": "exon", "start": 5000, "end": 6000}],
+        }
+    )
+    client = app.test_client()
+    for region, res, with_features in [
+        ("1:1-20000000", "a", False),
+        ("1:1-2000000", "b", False),
+        ("1:1-1000000", "c", True),
+        ("1:1-100000", "d", True),
+    ]:
+        response = client.get(
+            "/api/get-transcript-data",
+            query_string={"region": region, "genome_build": 38, "collapsed": False},
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["res"] == res
+        assert data["with_features"] is with_features
+        assert len(data["transcripts"]) == 1
+        assert ("features" in data["transcripts"][0]) is with_features
+
+
+@pytest.fixture(name="sample")
+def fixture_sample(app, tmp_path):
+    """Sample with coverage and BAF in tabix indexed bed files."""
+    files = {}
+    for name in ["cov", "baf"]:
+        bed = tmp_path / f"sample.{name}.bed"
+        bed.write_text(
+            "".join(
+                f"{res}_{chrom}\t{pos}\t{pos + 1}\t0.5\n"
+                for res in "abcdo"
+                for chrom in ["1", "2"]
+                for pos in range(0, 30_000_000, 1_000_000)
+            )
+        )
+        files[name] = pysam.tabix_index(str(bed), preset="bed")
+    store_sample(
+        app.config["GENS_DB"], "sample", 38, files["baf"], files["cov"], None
+    )
+    return "sample"
+
+
+def _coverage_request(sample_id, regions):
+    return {
+        "sample_id": sample_id,
+        "genome_build": 38,
+        "plot_height": 100,
+        "top_bottom_padding": 8,
+        "baf_y_start": 1,
+        "baf_y_end": 0,
+        "log2_y_start": 4,
+        "log2_y_end": -4,
+        "overview": True,
+        "reduce_data": 1,
+        "chromosome_pos": [
+            {"region": region, "x_pos": 10 * idx + 1, "y_pos": 10, "x_ampl": 100}
+            for idx, region in enumerate(regions)
+        ],
+    }
+
+
+def test_multiple_coverages(app, sample, monkeypatch):
+    """Test that coverage is read by workers in the order of the request."""
+    contexts = []
+    get_cov = api.get_cov
+
+    def recording_get_cov(*args, **kwargs):
+        # workers run with the context of the request
+        contexts.append(request.path)
+        return get_cov(*args, **kwargs)
+
+    monkeypatch.setattr(api, "get_cov", recording_get_cov)
+    client = app.test_client()
+    regions = ["2:0-None", "1:100-2000000"]
+    response = client.post(
+        "/api/get-multiple-coverages", json=_coverage_request(sample, regions)
+    )
+    assert response.status_code == 200
+    # results are matched with the requested chromosomes
+    results = response.get_json()["results"]
+    assert sorted(results) == ["1", "2"]
+    assert results["2"]["x_pos"] == 1
+    assert results["1"]["x_pos"] == 11
+    assert results["1"]["start"] == 100
+    assert contexts == ["/api/get-multiple-coverages"] * len(regions)
+
+
+def test_multiple_coverages_errors(app, sample):
+    """Test responses when a chromosome can not be read."""
+    client = app.test_client()
+    # regions that can not be parsed
+    response = client.post(
+        "/api/get-multiple-coverages",
+        json=_coverage_request(sample, ["1:0-None", "2:500-100"]),
+    )
+    assert response.status_code == 416
+    # chromosomes without chromosome size
+    response = client.post(
+        "/api/get-multiple-coverages",
+        json=_coverage_request(sample, ["1:0-None", "3:0-None"]),
+    )
+    assert response.status_code == 500
+
+
+def test_multiple_coverages_stream(app, sample):
+    """Test streaming chromosomes with errors as newline delimited json."""
+    client = app.test_client()
+    response = client.post(
+        "/api/get-multiple-coverages?format=ndjson",
+        json=_coverage_request(sample, ["1:0-None", "3:0-None", "2:0-None"]),
+    )
+    assert response.status_code == 200, response.data
+    records = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [rec["chromosome"] for rec in records] == ["1", "3", "2"]
+    assert [rec["status"] for rec in records] == ["ok", "error", "ok"]
+    assert len(records[2]["data"]) > 0
+
+
+def test_conditional_coverage_reads_sample_once(app, sample, monkeypatch):
+    """Test that a conditional coverage request looks up the sample once."""
+    calls = []
+    query_sample = conditional.query_sample
+
+    def counting_query_sample(*args, **kwargs):
+        calls.append(args)
+        return query_sample(*args, **kwargs)
+
+    monkeypatch.setattr(conditional, "query_sample", counting_query_sample)
+    client = app.test_client()
+    query = {
+        "sample_id": sample,
+        "region": "1:0-None",
+        "x_pos": 1,
+        "y_pos": 1,
+        "plot_height": 100,
+        "top_bottom_padding": 8,
+        "baf_y_start": 1,
+        "baf_y_end": 0,
+        "log2_y_start": 4,
+        "log2_y_end": -4,
+        "genome_build": 38,
+        "reduce_data": 1,
+        "x_ampl": 100,
+    }
+    response = client.get("/api/get-coverage", query_string=query)
+    assert response.status_code == 200
+    assert len(calls) == 1
+    # the sample is not looked up again when it is not modified
+    response = client.get(
+        "/api/get-coverage",
+        query_string=query,
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+    assert len(calls) == 2
@@ -0,0 +1,30 @@
+"""Test the process wide chromosome size table."""
+
+import datetime
+
+import mongomock
+
+from gens.db import chrom_sizes
+from gens.db.chrom_sizes import CHROMSIZES, get_chromosome_size
+
+
+def test_chromosome_size_table(monkeypatch):
+    """Test reading chromosome sizes once and refreshing them on updates."""
+    db = mongomock.MongoClient().gens
+    db[CHROMSIZES].insert_one({"chrom": "1", "genome_build": 38, "size": 100})
+
+    assert get_chromosome_size(db, "1", 38)["size"] == 100
+    # returned data are copies of the table without database ids
+    chrom_data = get_chromosome_size(db, "1", 38)
+    assert "_id" not in chrom_data
+    chrom_data["size"] = 0
+    assert get_chromosome_size(db, "1", 38)["size"] == 100
+
+    # updates are not read until they are registered in the updates collection
+    db[CHROMSIZES].update_one({"chrom": "1"}, {"$set": {"size": 200}})
+    monkeypatch.setattr(chrom_sizes._tables, "refresh_interval", 0)
+    assert get_chromosome_size(db, "1", 38)["size"] == 100
+    db["updates"].insert_one(
+        {"track": CHROMSIZES, "name": None, "timestamp": datetime.datetime.now()}
+    )
+    assert get_chromosome_size(db, "1", 38)["size"] == 200
@@ -0,0 +1,68 @@
+"""Test conditional responses."""
+
+import datetime
+import time
+
+import mongomock
+from flask import Flask, jsonify
+
+from gens.conditional import conditional, sample_versions, update_versions
+from gens.db import register_data_update, store_sample
+
+
+def test_conditional_response():
+    """Test answering conditional requests with 304 Not Modified."""
+    modified = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+    versions = [("v1", modified)]
+    app = Flask(__name__)
+    app.config["REFERENCE_CACHE_CONTROL"] = "public, no-cache"
+
+    @app.route("/data")
+    @conditional(lambda: versions)
+    def data():
+        return jsonify(status="ok")
+
+    client = app.test_client()
+    response = client.get("/data")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, no-cache"
+    assert response.last_modified == modified
+    etag = response.headers["ETag"]
+
+    # unchanged data is not sent again
+    response = client.get("/data", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    response = client.get(
+        "/data", headers={"If-Modified-Since": "Fri, 01 Jan 2021 00:00:00 GMT"}
+    )
+    assert response.status_code == 304
+
+    # changed data gives a new etag
+    versions[0] = ("v2", modified)
+    response = client.get("/data", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_versions_in_local_timezone(monkeypatch, tmp_path):
+    """Test that versions are in UTC when the server is not running in UTC."""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    try:
+        app = Flask(__name__)
+        app.config["GENS_DB"] = mongomock.MongoClient().gens
+        coverage = tmp_path / "coverage.bed.gz"
+        coverage.write_text("")
+        with app.app_context():
+            register_data_update("annotations")
+            store_sample(
+                app.config["GENS_DB"], "s1", 38, str(coverage), str(coverage), None
+            )
+            now = datetime.datetime.now(datetime.timezone.utc)
+            versions = update_versions("annotations") + sample_versions("s1", 38)
+            for _, modified in versions:
+                assert abs(modified - now) < datetime.timedelta(minutes=1)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,50 @@
+"""Test graph related functions."""
+
+import numpy as np
+
+from gens.graph import (REQUEST, convert_arrays, select_resolution,
+                        set_graph_values)
+
+
+def test_convert_arrays():
+    """Test converting positions and values to screen coordinates."""
+    req = REQUEST("1:1-1000", 10, 20, 180, 8, 1.0, 0.0, 3.0, -3.0, 38, None)
+    graph = set_graph_values(req)
+    log2 = (np.array([99.0, 199.0]), np.array([0.5, 5.0]))
+    baf = (np.array([149.0, 249.0]), np.array([0.25, -1.0]))
+
+    log2_rec, baf_rec = convert_arrays(graph, req, log2, baf, 10, 0, 0.5)
+    # x and y coordinates are returned as a flat list of integers
+    assert log2_rec == [59, 276, 109, 202]
+    assert baf_rec == [84, 151, 134, 224]
+
+    # regions without data gives empty lists
+    empty = (np.empty(0), np.empty(0))
+    assert convert_arrays(graph, req, empty, empty, 10, 0, 0.5) == ([], [])
+
+
+def test_envelope_downsampling():
+    """Test keeping the min, max and mean value for each pixel column."""
+    req = REQUEST("1:1-1000", 10, 20, 180, 8, 1.0, 0.0, 3.0, -3.0, 38, None, "envelope")
+    graph = set_graph_values(req)
+    log2 = (np.arange(5, dtype=float), np.array([0.5, -2.5, 2.5, 0.0, 1.0]))
+    baf = (np.array([10.0]), np.array([0.5]))
+
+    log2_rec, baf_rec = convert_arrays(graph, req, log2, baf, 10, 0, 0.25)
+    # positions 0-3 are drawn in the same pixel column
+    assert log2_rec == [10, 221, 10, 286, 10, 358, 11, 262]
+    assert baf_rec == [12, 110]
+
+
+def test_select_resolution():
+    """Test selecting resolution from plot width and bin sizes."""
+    # coarsest resolution with at least one point per pixel
+    assert select_resolution(50_000_000, 1000) == "a"
+    assert select_resolution(10_000_000, 1000) == "b"
+    assert select_resolution(10_000_000, 4000) == "c"
+    # the finest resolution is used for small regions
+    assert select_resolution(10_000, 1000) == "d"
+    # bin sizes of the sample are used
+    bin_sizes = {"o": 200000, "a": 50000, "b": 20000, "c": 2000, "d": 200}
+    assert select_resolution(10_000_000, 1000) == "b"
+    assert select_resolution(10_000_000, 1000, bin_sizes) == "c"
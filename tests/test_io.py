@@ -1,11 +1,17 @@
 """Test IO related functions."""
 
+import gzip
+import json
 import os
+import struct
+import threading
 from unittest.mock import Mock
 
+import pysam
 import pytest
 
-from gens.io import _get_filepath
+from gens.io import (TabixPool, _get_filepath, encode_binary,
+                     read_overview_file, tile_cache, tile_query)
 
 
 def test_get_filepath():
@@ -16,3 +22,120 @@ def test_get_filepath():
         _get_filepath(*PATH.split('/'), check=True)
 
     assert PATH == _get_filepath(*PATH.split('/'), check=False)
+
+
+def test_tabix_pool(tmp_path):
+    """Test reusing, replacing and evicting pooled tabix files."""
+    paths = []
+    for name in ["a", "b", "c"]:
+        bed = tmp_path / f"{name}.bed"
+        bed.write_text("a_1\t0\t1\t0.5\n")
+        paths.append(pysam.tabix_index(str(bed), preset="bed"))
+
+    pool = TabixPool(maxsize=2)
+    tbix = pool.get(paths[0])
+    # open handles are reused
+    assert pool.get(paths[0]) is tbix
+    # least recently used handles are closed when the pool is full
+    pool.get(paths[1])
+    pool.get(paths[2])
+    assert not tbix.is_open()
+    # replaced files are reopened
+    tbix = pool.get(paths[2])
+    os.utime(paths[2], ns=(0, 0))
+    assert pool.get(paths[2]) is not tbix
+    assert not tbix.is_open()
+    pool.clear()
+
+
+def test_tabix_pool_threads(tmp_path):
+    """Test sharing pooled tabix files between threads."""
+    bed = tmp_path / "a.bed"
+    bed.write_text("a_1\t0\t1\t0.5\n")
+    path = pysam.tabix_index(str(bed), preset="bed")
+    pool = TabixPool(maxsize=2)
+
+    def in_thread(func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    tbix = in_thread(lambda: pool.get(path))
+    # handles of finished threads are reused
+    assert in_thread(lambda: pool.get(path)) is tbix
+    # running threads get handles of their own
+    running = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        held = pool.get(path)
+        running.set()
+        done.wait()
+        return held
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    running.wait()
+    assert pool.get(path) is not tbix
+    assert tbix.is_open()
+    done.set()
+    thread.join()
+    pool.clear()
+    assert not tbix.is_open()
+
+
+def test_tile_query(tmp_path):
+    """Test reading regions spanning several tiles from the tile cache."""
+    bed = tmp_path / "sample.cov.bed"
+    # the tile width of resolution d is 200 kb
+    bed.write_text("".join(
+        f"d_1\t{pos}\t{pos + 1}\t{pos / 1000}\n" for pos in range(0, 600000, 250)
+    ))
+    tbix = pysam.TabixFile(pysam.tabix_index(str(bed), preset="bed"))
+    tile_cache.clear()
+
+    positions, values = tile_query(tbix, "d", "1", 150000, 450000, 0.5)
+    # every other data point is kept
+    expected = list(range(150000, 450000, 500))
+    assert positions.tolist() == expected
+    assert values.tolist() == [pos / 1000 for pos in expected]
+    assert len(tile_cache._entries) == 3
+
+    # overlapping regions reuse the cached tiles
+    positions, _ = tile_query(tbix, "d", "1", 100000, 300000)
+    assert positions[0] == 100000 and positions[-1] == 299750
+    assert len(tile_cache._entries) == 3
+    tile_cache.clear()
+
+
+def test_read_overview_file(tmp_path):
+    """Test reading and caching overview files as arrays."""
+    path = tmp_path / "sample.overview.json.gz"
+    with gzip.open(path, "wt") as json_gz:
+        json.dump({"1": {"cov": [[100, 0.5], [200, -1.0]], "baf": []}}, json_gz)
+
+    data = read_overview_file(str(path))
+    positions, values = data["1"]["cov"]
+    assert positions.tolist() == [100, 200]
+    assert values.tolist() == [0.5, -1.0]
+    assert len(data["1"]["baf"][0]) == 0
+    # parsed files are cached
+    assert read_overview_file(str(path)) is data
+
+
+def test_encode_binary():
+    """Test encoding coverage arrays as little-endian int32 values."""
+    encoded = encode_binary({"chrom": "1", "data": [10, -20], "baf": [30]})
+    (header_len,) = struct.unpack_from("<I", encoded)
+    # arrays are aligned to four bytes
+    assert (4 + header_len) % 4 == 0
+    header = json.loads(encoded[4 : 4 + header_len])
+    assert header == {
+        "chrom": "1",
+        "data": {"$int32": [0, 2]},
+        "baf": {"$int32": [2, 1]},
+    }
+    values = struct.unpack("<3i", encoded[4 + header_len :])
+    assert values == (10, -20, 30)
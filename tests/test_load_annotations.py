@@ -0,0 +1,65 @@
+"""Test loading of annotations."""
+
+import random
+
+from gens.load import read_annotation_file, set_height_order
+
+
+def _linear_height_order(annotations):
+    """Place annotations on the first level that is free, scanning from level 1."""
+    levels = []
+    for annot in sorted(annotations, key=lambda annot: annot["start"]):
+        for level, end in enumerate(levels, 1):
+            if annot["start"] > end:
+                break
+        else:
+            levels.append(None)
+            level = len(levels)
+        levels[level - 1] = annot["end"]
+        annot["height_order"] = level
+
+
+def test_set_height_order():
+    """Test that annotations are placed on the lowest free level."""
+    annotations = [
+        {"chrom": "1", "start": 1, "end": 10},
+        {"chrom": "1", "start": 5, "end": 20},
+        {"chrom": "1", "start": 10, "end": 12},
+        {"chrom": "1", "start": 11, "end": 30},
+        {"chrom": "2", "start": 5, "end": 6},
+    ]
+    set_height_order(annotations)
+    assert [annot["height_order"] for annot in annotations] == [1, 2, 3, 1, 1]
+
+    rng = random.Random(0)
+    annotations = []
+    for _ in range(2000):
+        start = rng.randrange(0, 100_000)
+        annotations.append(
+            {
+                "chrom": rng.choice("12"),
+                "start": start,
+                "end": start + rng.randrange(5000),
+            }
+        )
+    expected = [dict(annot) for annot in annotations]
+    for chrom in "12":
+        _linear_height_order([annot for annot in expected if annot["chrom"] == chrom])
+    assert set_height_order(annotations) == expected
+
+
+def test_read_annotation_file(tmp_path):
+    """Test reading annotations and counting rejected entries."""
+    aed_file = tmp_path / "databank.aed"
+    aed_file.write_text(
+        "bio:sequence(aed:String)\tbio:start(aed:Integer)\tbio:end(aed:Integer)\t"
+        "aed:name(aed:String)\n"
+        "1\t100\t200\tA\n"
+        "1\t150\t300\tB\n"
+        "1\tx\t300\tC\n"
+    )
+    annotations, n_rejected = read_annotation_file(aed_file, "38")
+    assert n_rejected == 1
+    assert [annot["name"] for annot in annotations] == ["A", "B"]
+    assert [annot["height_order"] for annot in annotations] == [1, 2]
+    assert {annot["source"] for annot in annotations} == {"databank"}
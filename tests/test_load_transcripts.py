@@ -0,0 +1,44 @@
+"""Test loading of transcripts."""
+
+import gzip
+import io
+
+from gens.load import build_transcripts
+
+MANE = "Ensembl_nuc\tHGNC_ID\tRefSeq_nuc\tMANE_status\nENST2.1\tHGNC:1\tNM_1.1\tMANE Select\n"
+
+
+def _gtf_line(feature, start, end, gene_id, transcript_id=None, exon_number=None):
+    attribs = f'gene_id "{gene_id}"; gene_name "{gene_id.lower()}"; '
+    attribs += 'gene_biotype "protein_coding"; transcript_biotype "protein_coding";'
+    if transcript_id:
+        attribs += f' transcript_id "{transcript_id}";'
+    if exon_number:
+        attribs += f' exon_number "{exon_number}";'
+    return f"1\tensembl\t{feature}\t{start}\t{end}\t.\t+\t.\t{attribs}\n"
+
+
+def test_build_transcripts(tmp_path):
+    """Test reading transcripts of each gene from a gzipped gtf file."""
+    gtf_file = tmp_path / "transcripts.gtf.gz"
+    with gzip.open(gtf_file, "wt") as gtf:
+        gtf.write("#!genome-build GRCh38\n")
+        gtf.write(_gtf_line("gene", 100, 500, "GENE1"))
+        gtf.write(_gtf_line("transcript", 100, 500, "GENE1", "ENST1"))
+        gtf.write(_gtf_line("exon", 300, 500, "GENE1", "ENST1", 2))
+        gtf.write(_gtf_line("exon", 100, 200, "GENE1", "ENST1", 1))
+        gtf.write(_gtf_line("transcript", 150, 500, "GENE1", "ENST2"))
+        gtf.write(_gtf_line("exon", 150, 500, "GENE1", "ENST2", 1))
+        gtf.write(_gtf_line("transcript", 1000, 2000, "GENE2", "ENST3"))
+        gtf.write(_gtf_line("five_prime_utr", 1000, 1100, "GENE2", "ENST3"))
+
+    transcripts = list(build_transcripts(gtf_file, io.StringIO(MANE), "38"))
+    assert [tr["transcript_id"] for tr in transcripts] == ["ENST1", "ENST2", "ENST3"]
+    # mane transcripts are placed first
+    assert [tr["height_order"] for tr in transcripts] == [2, 1, 1]
+    assert transcripts[1]["refseq_id"] == "NM_1.1"
+    # features are sorted on their start position
+    assert [ft["exon_number"] for ft in transcripts[0]["features"]] == [1, 2]
+    assert transcripts[2]["features"] == [
+        {"feature": "five_prime_utr", "start": 1000, "end": 1100}
+    ]
@@ -0,0 +1,50 @@
+"""Test prefetching of neighbouring regions."""
+
+import threading
+
+from gens.graph import REGION
+from gens.prefetch import Prefetcher, prefetch_regions
+from gens.workers import WorkerPool
+
+
+def test_prefetch_regions():
+    """Test getting regions next to a region and of the next zoom level."""
+    region = REGION("b", "1", 10_000_000, 20_000_000)
+    assert prefetch_regions(region, 9_000_000, 21_000_000, 1500) == [
+        ("b", "1", 0, 9_000_000),
+        ("b", "1", 21_000_000, 33_000_000),
+        ("c", "1", 11_400_000, 18_600_000),
+    ]
+
+
+def test_prefetcher_cancels_stale_jobs():
+    """Test that queued jobs are cancelled when a new region is requested."""
+    prefetcher = Prefetcher(WorkerPool("test", "TEST_WORKERS", 1), max_queued=3)
+    started, release = threading.Event(), threading.Event()
+    done = []
+
+    def job(name):
+        started.set()
+        release.wait(5)
+        done.append(name)
+
+    prefetcher.schedule("sample", job, [("a",), ("b",), ("c",), ("d",)])
+    started.wait(5)
+    # jobs exceeding the queue size are dropped
+    assert len(prefetcher._jobs["sample"]) == 3
+    prefetcher.schedule("sample", job, [("e",)])
+    release.set()
+    prefetcher.pool.executor.shutdown(wait=True)
+    assert done == ["a", "e"]
+
+
+def test_prefetcher_prunes_finished_keys():
+    """Test that keys are removed when their jobs have finished."""
+    prefetcher = Prefetcher(WorkerPool("test", "TEST_WORKERS", 1), max_queued=3)
+    for key in ["s1", "s2"]:
+        prefetcher.schedule(key, lambda: None, [()])
+        for job in prefetcher._jobs[key]:
+            job.result(5)
+    prefetcher.schedule("s3", lambda: None, [])
+    assert list(prefetcher._generations) == ["s3"]
+    assert list(prefetcher._jobs) == []
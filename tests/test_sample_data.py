@@ -0,0 +1,67 @@
+"""Test building coverage and BAF data files."""
+
+import pysam
+
+from gens.io import read_overview_file
+from gens.load.sample_data import (CoverageWindow, baf_records, build_overview,
+                                   gvcf_frequency)
+
+
+def test_coverage_window():
+    """Test collecting coverage regions into windows."""
+    window = CoverageWindow(300)
+    assert window.add(1, 100, 1.0) is None
+    assert window.add(101, 200, 2.0) is None
+    # window is ended when it is at least as large as the window size
+    assert window.add(201, 300, 3.0) == (150, 2.0)
+    assert window.add(301, 400, 1.0) is None
+    # large gaps ends the window prematurely
+    assert window.add(1001, 1100, 2.0) == (350, 1.0)
+    assert window.flush() == (1050, 2.0)
+    assert window.flush() is None
+
+
+def test_baf_records():
+    """Test calculating BAF of SNP positions from gVCF records."""
+    fmt = "GT:AD:DP:GQ:PL"
+    records = [
+        "1\t100\t.\tA\t<NON_REF>\t.\t.\tEND=199\tGT:DP:GQ:MIN_DP:PL\t0/0:30:60:25:0",
+        f"1\t200\t.\tA\tC,<NON_REF>\t50\t.\tDP=20\t{fmt}\t0/1:15,5,0:20:50:0",
+        f"1\t300\t.\tA\tCG,<NON_REF>\t50\t.\tDP=20\t{fmt}\t0/1:15,5,0:20:50:0",
+        f"1\t400\t.\tA\tC,<NON_REF>\t50\t.\tDP=5\t{fmt}\t0/1:3,2,0:5:50:0",
+        f"1\t500\t.\tA\tC,<NON_REF>\t50\t.\tDP=10\t{fmt}\t0/0:8,2,0:10:50:0",
+    ]
+    fields = [rec.split("\t") for rec in records]
+    # records without allele depths have a BAF of 0
+    assert gvcf_frequency(fields[0]) == 0
+    assert gvcf_frequency(fields[1]) == 0.25
+    # indels and records with low depth are skipped
+    assert gvcf_frequency(fields[2]) is None
+    assert gvcf_frequency(fields[3]) is None
+    # reference calls uses the largest alternative allele depth
+    assert gvcf_frequency(fields[4]) == 0.2
+
+    positions = [50, 100, 200, 300, 400, 450, 500, 600]
+    assert list(baf_records(records, positions)) == [(100, 0), (200, 0.25), (500, 0.2)]
+
+
+def test_build_overview(tmp_path):
+    """Test building overview file from the overview resolution."""
+    files = {}
+    for name, records in [
+        ("cov", ["a_1\t99\t100\t0.5", "o_1\t99\t100\t0.25", "o_2\t9\t10\t-1.0"]),
+        ("baf", ["o_1\t49\t50\t0.5"]),
+    ]:
+        bed = tmp_path / f"sample.{name}.bed"
+        bed.write_text("\n".join(records) + "\n")
+        files[name] = pysam.tabix_index(str(bed), preset="bed")
+
+    overview_file = str(tmp_path / "sample.overview.json.gz")
+    build_overview(files["cov"], files["baf"], overview_file)
+    overview = read_overview_file(overview_file)
+    assert sorted(overview) == ["1", "2"]
+    assert overview["1"]["cov"][0].tolist() == [99]
+    assert overview["1"]["cov"][1].tolist() == [0.25]
+    assert overview["1"]["baf"][0].tolist() == [49]
+    # chromosomes without BAF have empty tracks
+    assert len(overview["2"]["baf"][0]) == 0
@@ -0,0 +1,59 @@
+"""Test reloading collections through staging collections."""
+
+import mongomock
+import pytest
+from flask import Flask
+
+from gens.db import (ANNOTATIONS_COLLECTION, TRANSCRIPTS_COLLECTION,
+                     create_staging_collection, get_content_hash,
+                     register_data_update, replace_with_staging,
+                     staging_collection)
+from gens.db.staging import LOCKS, collection_lock
+
+
+def test_replace_with_staging():
+    """Test that kept and new records replace the collection with indexes."""
+    db = mongomock.MongoClient().gens
+    db[ANNOTATIONS_COLLECTION].insert_many(
+        [{"source": "old", "name": "a"}, {"source": "kept", "name": "b"}]
+    )
+    staging = create_staging_collection(
+        db, ANNOTATIONS_COLLECTION, keep={"source": {"$ne": "old"}}
+    )
+    staging.insert_one({"source": "old", "name": "c"})
+    # the collection is unchanged until it is replaced
+    assert db[ANNOTATIONS_COLLECTION].count_documents({}) == 2
+
+    replace_with_staging(db, ANNOTATIONS_COLLECTION)
+    names = [rec["name"] for rec in db[ANNOTATIONS_COLLECTION].find()]
+    assert sorted(names) == ["b", "c"]
+    assert "genome_bin" in db[ANNOTATIONS_COLLECTION].index_information()
+    assert staging.name not in db.list_collection_names()
+
+
+def test_staging_collection_lock():
+    """Test that loads are locked and failed loads keep the collection."""
+    db = mongomock.MongoClient().gens
+    db[ANNOTATIONS_COLLECTION].insert_one({"source": "old", "name": "a"})
+    with pytest.raises(RuntimeError):
+        with staging_collection(db, ANNOTATIONS_COLLECTION) as staging:
+            staging.insert_one({"source": "new", "name": "b"})
+            # a second load of the collection has to wait
+            with pytest.raises(TimeoutError):
+                with collection_lock(db, ANNOTATIONS_COLLECTION, timeout=0):
+                    pass
+            raise RuntimeError("failed load")
+    assert [rec["name"] for rec in db[ANNOTATIONS_COLLECTION].find()] == ["a"]
+    assert staging.name not in db.list_collection_names()
+    assert db[LOCKS].count_documents({}) == 0
+
+
+def test_content_hash_per_genome_build():
+    """Test that content hashes of tracks are stored per genome build."""
+    app = Flask(__name__)
+    app.config["GENS_DB"] = mongomock.MongoClient().gens
+    with app.app_context():
+        register_data_update(TRANSCRIPTS_COLLECTION, content_hash="a", genome_build=38)
+        register_data_update(TRANSCRIPTS_COLLECTION, content_hash="b", genome_build=37)
+        assert get_content_hash(TRANSCRIPTS_COLLECTION, genome_build=38) == "a"
+        assert get_content_hash(TRANSCRIPTS_COLLECTION, genome_build=37) == "b"
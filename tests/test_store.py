@@ -0,0 +1,53 @@
+"""Test the memory-mapped coverage store."""
+
+import gzip
+import os
+
+from gens.store import (CoverageStore, StorePool, convert_bed_to_store,
+                        store_query, write_store)
+
+
+def test_convert_bed_to_store(tmp_path):
+    """Test converting a bed file and querying regions of the store."""
+    bed_file = tmp_path / "sample.cov.bed.gz"
+    with gzip.open(bed_file, "wt") as bed:
+        bed.write("o_1\t99\t100\t0.5\n")
+        bed.write("a_1\t199\t200\t-1.0\n")
+        bed.write("a_1\t99\t100\t0.25\n")
+        bed.write("a_1\t299\t300\t1.5\n")
+
+    store_file = convert_bed_to_store(str(bed_file))
+    assert store_file == str(tmp_path / "sample.cov.gens")
+    # already converted files are not converted again
+    assert convert_bed_to_store(store_file) == store_file
+
+    store = CoverageStore(store_file)
+    positions, values = store.fetch("a_1")
+    # records are sorted on position
+    assert positions.tolist() == [99, 199, 299]
+    assert values.tolist() == [0.25, -1.0, 1.5]
+
+    # regions are half open intervals
+    positions, values = store_query(store, "a", "1", 100, 299)
+    assert positions.tolist() == [199]
+    assert values.tolist() == [-1.0]
+
+    # missing records gives empty results
+    positions, _ = store_query(store, "b", "1", 0, 1000)
+    assert len(positions) == 0
+
+
+def test_store_pool(tmp_path):
+    """Test that opened stores are reused until the file is replaced."""
+    store_file = str(tmp_path / "sample.cov.gens")
+    write_store(store_file, [("a_1", [1], [0.5])])
+    pool = StorePool(maxsize=2)
+    store = pool.get(store_file)
+    assert pool.get(store_file) is store
+
+    # replaced files are opened again
+    write_store(store_file, [("a_1", [1, 2], [0.5, 1.0])])
+    os.utime(store_file, ns=(0, 0))
+    replaced = pool.get(store_file)
+    assert replaced is not store
+    assert replaced.fetch("a_1")[0].tolist() == [1, 2]